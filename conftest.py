@@ -5,7 +5,7 @@ import pytest
 import json
 from django.contrib.auth.models import User
 from notes.models import Note
-from notes.utils import generate_embedding
+from notes.utils import generate_embedding, generate_embeddings_batch
 
 
 @pytest.fixture
@@ -33,12 +33,11 @@ def regular_user(db):
 @pytest.fixture
 def sample_note(db):
     """Create a sample note with embedding."""
-    note = Note.objects.create(
+    note = Note(
         title="Test Note",
         content="This is a test note about machine learning and AI."
     )
-    embedding = generate_embedding(note.content)
-    note.set_embedding_list(embedding)
+    note.set_embedding_list(generate_embedding(note.content))
     note.save()
     return note
 
@@ -54,15 +53,12 @@ def multiple_notes(db):
         {"title": "Data Science", "content": "Data science combines statistics and programming."},
     ]
     
-    notes = []
-    for data in notes_data:
-        note = Note.objects.create(**data)
-        embedding = generate_embedding(note.content)
+    notes = [Note(**data) for data in notes_data]
+    embeddings = generate_embeddings_batch([note.content for note in notes])
+    for note, embedding in zip(notes, embeddings):
         note.set_embedding_list(embedding)
-        note.save()
-        notes.append(note)
     
-    return notes
+    return Note.objects.bulk_create(notes)
 
 
 @pytest.fixture
@@ -0,0 +1,44 @@
+"""
+Optional Numba kernels for the semantic search hot path.
+
+NumPy has no int8 matrix-vector kernel, so the int8 scan in
+SemanticSearchService.top_matches only beats float32 BLAS when these
+compiled loops are available. Import NUMBA_AVAILABLE to check.
+"""
+import math
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def int8_dot_scores(matrix, query, out):
+        """Write the int32 dot product of each int8 matrix row with query into out."""
+        for i in prange(matrix.shape[0]):
+            acc = 0
+            for j in range(matrix.shape[1]):
+                acc += np.int32(matrix[i, j]) * np.int32(query[j])
+            out[i] = acc
+
+    @njit(fastmath=True, cache=True)
+    def cosine_scalar(a, b):
+        """Cosine similarity of two equal-length float64 vectors in one fused pass."""
+        dot = 0.0
+        norm_a = 0.0
+        norm_b = 0.0
+        for i in range(a.shape[0]):
+            dot += a[i] * b[i]
+            norm_a += a[i] * a[i]
+            norm_b += b[i] * b[i]
+        if norm_a == 0.0 or norm_b == 0.0:
+            return 0.0
+        return dot / math.sqrt(norm_a * norm_b)
+else:
+    int8_dot_scores = None
+    cosine_scalar = None
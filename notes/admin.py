@@ -1,17 +1,47 @@
 from django import forms
 from django.contrib import admin
 from django.utils.html import format_html
+from django.utils.safestring import mark_safe
 from django.contrib import messages
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
 from django.urls import reverse, path
 from django.http import JsonResponse
-from django.db import models
+from django.db import connection, models
 from django.db.models import Case, When, IntegerField, Value
+from django.db.models.expressions import RawSQL
 from .models import Note
-from .utils import generate_embedding, cosine_similarity
+from .utils import generate_embedding
 from .services import SemanticSearchService, AIService
+from .index import note_index
+import logging
 import numpy as np
 import json
 
+logger = logging.getLogger(__name__)
+
+# Prebuilt relevance badge; only numbers and fixed colors are interpolated,
+# so it is safe to skip format_html's escaping on every row.
+MATCH_SCORE_HTML = '<span style="color: {}; font-weight: bold;">{:.1f}%</span>'
+MATCH_COLOR_HIGH = "#198754"
+MATCH_COLOR_LOW = "#6c757d"
+
+
+def _query_embedding(query):
+    """L2-normalized float32 embedding of an admin search query (memoized by generate_embedding)."""
+    return np.asarray(generate_embedding(query), dtype=np.float32)
+
+
+class SemanticChangeList(ChangeList):
+    """ChangeList that keeps the similarity order of semantic search results."""
+    
+    def get_ordering(self, request, queryset):
+        # The default ChangeList puts Meta.ordering (-created_at) ahead of the
+        # queryset's own ordering; column sorts from the query string still win
+        if 'semantic_rank' in queryset.query.annotations and ORDER_VAR not in self.params:
+            return self._get_deterministic_ordering(['semantic_rank'])
+        return super().get_ordering(request, queryset)
+
+
 @admin.register(Note)
 class NoteAdmin(admin.ModelAdmin):
     # change_list_template = "admin/notes/note/change_list.html"
@@ -42,11 +72,7 @@ class NoteAdmin(admin.ModelAdmin):
     def match_score(self, obj):
         """Displays the similarity score if a semantic search is active."""
         # Retrieve score from the request (saved in get_queryset)
-        request = getattr(self, 'request_reference', None)
-        if not request:
-            return "—"
-        
-        scores = getattr(request, 'semantic_scores', {})
+        scores = getattr(getattr(self, 'request_reference', None), 'semantic_scores', None)
         if not scores:
             return "—"
         
@@ -55,12 +81,8 @@ class NoteAdmin(admin.ModelAdmin):
             return "—"
         
         # Green for high match, Grey for low
-        color = "#198754" if score > 0.5 else "#6c757d"
-        score_percent = f"{score * 100:.1f}"
-        return format_html(
-            '<span style="color: {}; font-weight: bold;">{}%</span>', 
-            color, score_percent
-        )
+        color = MATCH_COLOR_HIGH if score > 0.5 else MATCH_COLOR_LOW
+        return mark_safe(MATCH_SCORE_HTML.format(color, score * 100))
     match_score.short_description = "Relevance"
 
     def title_display(self, obj):
@@ -89,7 +111,8 @@ class NoteAdmin(admin.ModelAdmin):
     # --- LOGIC HANDLERS ---
 
     def save_model(self, request, obj, form, change):
-        if not change or 'content' in form.changed_data or 'title' in form.changed_data:
+        # Only content is embedded, so metadata-only edits keep the stored vector
+        if not change or 'content' in form.changed_data or not obj.embedding:
             if obj.content:
                 try:
                     embedding = generate_embedding(obj.content)
@@ -111,103 +134,95 @@ class NoteAdmin(admin.ModelAdmin):
         if not semantic_query:
             return qs
 
-        try:
-            # 1. Vectorize Query
-            query_vec = np.array(generate_embedding(semantic_query))
-            query_norm = np.linalg.norm(query_vec)
-            
-            if query_norm == 0:
-                messages.warning(request, "Could not generate query embedding.")
-                return qs
-            
-            # 2. Fast Fetch (ID + Embedding only)
-            rows = Note.objects.exclude(embedding='').exclude(embedding__isnull=True).values_list('id', 'embedding')
-            if not rows:
-                messages.info(request, "No notes with embeddings found.")
+        # Django admin calls get_queryset more than once per changelist;
+        # reuse this request's ranking instead of scanning again
+        cached = getattr(request, '_semantic_top', None)
+        if cached is not None and cached[0] == semantic_query:
+            top_ids = cached[1]
+            if not top_ids:
                 return qs.none()
+            return self._order_by_ids(Note.objects.filter(pk__in=top_ids), top_ids)
 
-            # 3. Prepare Matrix
-            ids = []
-            vectors = []
-            for note_id, emb_str in rows:
-                if not emb_str:
-                    continue
-                try:
-                    vec = json.loads(emb_str)
-                    if vec and isinstance(vec, list) and len(vec) > 0:
-                        vectors.append(vec)
-                        ids.append(note_id)
-                except (ValueError, TypeError, json.JSONDecodeError):
-                    continue
-            
-            if not vectors or len(vectors) == 0:
-                messages.info(request, "No valid embeddings found.")
+        try:
+            # 1. Cached, pre-normalized matrix (rebuilt only when notes change).
+            # Checked first so an empty DB never pays for encoding the query.
+            if note_index.enabled:
+                has_embeddings = note_index.refresh() > 0
+            else:
+                ids, matrix = SemanticSearchService.get_embedding_matrix()
+                has_embeddings = ids.size > 0
+            if not has_embeddings:
+                messages.info(request, "No notes with embeddings found.")
                 return qs.none()
-
-            # 4. Matrix Math (Fast)
-            matrix = np.array(vectors)
-            matrix_norms = np.linalg.norm(matrix, axis=1)
             
-            # Prevent divide by zero
-            matrix_norms[matrix_norms == 0] = 1e-10
+            # 2. Vectorize Query (cached, so paginating doesn't re-encode)
+            query_vec = _query_embedding(semantic_query.lower())
             
-            dot_products = np.dot(matrix, query_vec)
-            scores = dot_products / (matrix_norms * query_norm)
+            if not query_vec.any():
+                messages.warning(request, "Could not generate query embedding.")
+                return qs
 
-            # 5. Sort & Top K
-            results = list(zip(ids, scores))
-            
-            # Filter out noise (< 15% match)
-            results = [r for r in results if r[1] > 0.15]
-            
-            # Sort Highest -> Lowest
-            results.sort(key=lambda x: x[1], reverse=True)
-            
-            # Keep top 3 results
-            top_results = results[:10]
+            # 3. Matrix Math & Top K (single matrix-vector product + partial selection,
+            # or an HNSW lookup when that index is enabled)
+            if note_index.enabled:
+                hit_ids, top_scores = note_index.query(query_vec, 10)
+            else:
+                top_idx, top_scores = SemanticSearchService.top_matches(query_vec, matrix, 10)
+                hit_ids = ids[top_idx]
+
+            # 4. Filter out noise (< 15% match)
+            keep = top_scores > 0.15
+            hit_ids, top_scores = hit_ids[keep], top_scores[keep]
             
-            if not top_results:
+            if not hit_ids.size:
+                request._semantic_top = (semantic_query, [])
                 messages.warning(request, "No notes match that meaning (threshold: 15%).")
                 return qs.none()
             
-            top_ids = [r[0] for r in top_results]
-            scores_dict = {int(r[0]): float(r[1]) for r in top_results}
+            top_ids = hit_ids.tolist()
+            request._semantic_top = (semantic_query, top_ids)
+            scores_dict = dict(zip(top_ids, top_scores.tolist()))
 
             # Save scores for UI - store on request object
-            if not hasattr(request, 'semantic_scores'):
-                request.semantic_scores = {}
-            request.semantic_scores.update(scores_dict)
+            request.semantic_scores = scores_dict
 
             messages.success(request, f"Found {len(top_ids)} relevant notes.")
             
             # Use Note.objects directly to bypass any admin filters
-            # Return filtered queryset - ordering by similarity will be handled by the order of IDs
-            # SQLite preserves IN clause order in some cases, but we'll use Case/When for reliability
-            try:
-                if len(top_ids) > 1:
-                    ordering_cases = [When(pk=pk, then=Value(idx)) for idx, pk in enumerate(top_ids)]
-                    order_field = Case(
-                        *ordering_cases,
-                        default=Value(999),
-                        output_field=IntegerField(),
-                    )
-                    return Note.objects.filter(pk__in=top_ids).order_by(order_field)
-                else:
-                    return Note.objects.filter(pk__in=top_ids)
-            except (Exception, ValueError, TypeError) as order_error:
-                # Fallback: return without ordering if Case/When fails
-                return Note.objects.filter(pk__in=top_ids)
+            # Return filtered queryset ordered by similarity (the order of top_ids)
+            return self._order_by_ids(Note.objects.filter(pk__in=top_ids), top_ids)
 
         except Exception as e:
-            import traceback
             error_msg = f"Search Error: {str(e)}"
             messages.error(request, error_msg)
             # Log the full traceback for debugging
-            print(f"Semantic search error: {error_msg}")
-            traceback.print_exc()
+            logger.exception("Semantic search error")
             # Return normal queryset instead of empty to avoid redirect issues
             return qs
     
+    def _order_by_ids(self, queryset, ids):
+        """Annotate rows with their position in ids as semantic_rank and order by it."""
+        id_column = f'{connection.ops.quote_name(Note._meta.db_table)}.{connection.ops.quote_name("id")}'
+        if connection.vendor == 'sqlite':
+            # Position of ",<id>," inside ",id1,id2,...," sorts like the list
+            rank = RawSQL(
+                f"INSTR(%s, ',' || {id_column} || ',')",
+                [',' + ','.join(map(str, ids)) + ','],
+                output_field=IntegerField(),
+            )
+        elif connection.vendor == 'postgresql':
+            rank = RawSQL(f"array_position(%s::bigint[], {id_column})", [list(ids)], output_field=IntegerField())
+        else:
+            # Every row is in ids, so no default branch is needed
+            rank = Case(
+                *[When(pk=pk, then=Value(idx)) for idx, pk in enumerate(ids)],
+                output_field=IntegerField(),
+            )
+        return queryset.annotate(semantic_rank=rank).order_by('semantic_rank')
+    
+    def get_changelist(self, request, **kwargs):
+        return SemanticChangeList
+    
     def changelist_view(self, request, extra_context=None):
         # Store request for match_score to use later
         self.request_reference = request
@@ -264,8 +279,7 @@ class NoteAdmin(admin.ModelAdmin):
         except json.JSONDecodeError as e:
             return JsonResponse({'answer': f'Invalid request format: {str(e)}'}, status=200)
         except Exception as e:
-            import traceback
-            traceback.print_exc()
+            logger.exception("AI assistant error")
             return JsonResponse({
                 'answer': f'Sorry, I encountered an error: {str(e)}'
             }, status=200)
@@ -5,3 +5,20 @@ class NotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notes'
 
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from .index import connect_signals, note_index
+        from .models import Note
+        from .services import invalidate_embedding_cache
+
+        # Writes in this process free the search matrix right away; the table
+        # stamp check still catches bulk_update and writes from other processes
+        post_save.connect(invalidate_embedding_cache, sender=Note, dispatch_uid='notes_emb_cache_save')
+        post_delete.connect(invalidate_embedding_cache, sender=Note, dispatch_uid='notes_emb_cache_delete')
+
+        if note_index.enabled:
+            import atexit
+
+            connect_signals()
+            note_index.load()
+            atexit.register(note_index.save)
@@ -8,7 +8,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 django.setup()
 
 from .models import Note  
-from .utils import generate_embedding, cosine_similarity 
+from .utils import generate_embedding
+from .services import SemanticSearchService
 
 print("Loading Gemma...")
 gemma_pipe = pipeline(
@@ -18,6 +19,23 @@ gemma_pipe = pipeline(
     device_map="auto"
 )
 
+# When Gemma sits on a GPU, score notes there too with an fp16 copy of the
+# cached embedding matrix; it is re-uploaded whenever that cache is rebuilt.
+_pipe_device = getattr(gemma_pipe, "device", None)
+SCORE_DEVICE = _pipe_device if _pipe_device is not None and _pipe_device.type == "cuda" else None
+_device_matrix = {"ids": None, "M": None}
+
+
+def _get_device_matrix():
+    ids, matrix = SemanticSearchService.get_embedding_matrix()
+    if _device_matrix["ids"] is not ids:
+        _device_matrix.update(
+            ids=ids,
+            M=torch.as_tensor(matrix, device=SCORE_DEVICE, dtype=torch.float16),
+        )
+    return ids, _device_matrix["M"]
+
+
 def _guess_title(text: str) -> str:
     head = text.strip().splitlines()[0] if text.strip() else ""
     if len(head) > 80:
@@ -36,29 +54,29 @@ def add_note_to_db(text, title=None):
 
 def get_best_notes(query, top_k=3):
     """Finds the most relevant notes using the Django DB."""
-    query_vector = generate_embedding(query)
-    
-    scored_notes = []
-    
-    # ERROR FIX: Use Django's Note.objects.all(), not 'notes_db'
-    all_notes = Note.objects.all()
-    
-    for note in all_notes:
-        # ERROR FIX: Use the method to get the list, not dictionary access ['vector']
-        note_vector = note.get_embedding_list()
-        
-        if note_vector is None:
-            continue
-            
-        score = cosine_similarity(query_vector, note_vector)
-        
-        # ERROR FIX: Use note.content, not note['text']
-        scored_notes.append((score, note.content))
-    
-    # Sort by score (highest first)
-    scored_notes.sort(key=lambda x: x[0], reverse=True)
-    
-    return [note[1] for note in scored_notes[:top_k]]
+    query_vector = np.asarray(generate_embedding(query), dtype=np.float32)
+    query_norm = np.linalg.norm(query_vector)
+    if query_norm == 0:
+        return []
+    query_vector /= query_norm
+
+    # One cached (N, D) matrix of normalized embeddings -> a single matmul
+    if SCORE_DEVICE is not None:
+        ids, matrix = _get_device_matrix()
+        if not ids.size:
+            return []
+        q = torch.as_tensor(query_vector, device=SCORE_DEVICE, dtype=torch.float16)
+        top = torch.topk(matrix @ q, min(top_k, ids.size)).indices.cpu().numpy()
+    else:
+        ids, matrix = SemanticSearchService.get_embedding_matrix()
+        if not ids.size:
+            return []
+        top, _ = SemanticSearchService.top_matches(query_vector, matrix, top_k)
+    top_ids = ids[top].tolist()
+
+    # Only the top K rows are read, and only their content column
+    contents = dict(Note.objects.filter(pk__in=top_ids).values_list('id', 'content'))
+    return [contents[note_id] for note_id in top_ids if note_id in contents]
 
 def ask_ai(question):
     relevant_notes = get_best_notes(question, top_k=3)
@@ -0,0 +1,210 @@
+"""
+Optional HNSW approximate-nearest-neighbour index over note embeddings.
+
+Enabled with the NOTES_HNSW_SEARCH setting when hnswlib is installed. The index
+is kept current by post_save/post_delete signals (see NotesConfig.ready) and is
+checked against the same (latest updated_at, note count) stamp as the search
+matrix cache, so writes that bypass signals (bulk_update, other processes)
+trigger a rebuild on the next query.
+"""
+import datetime
+import json
+import logging
+import os
+import tempfile
+import threading
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+
+class NoteIndex:
+    """HNSW index of embeddings labelled by note id; scores are inner products."""
+
+    def __init__(self, path=None, m=16, ef_construction=200, ef_search=64):
+        self.path = path
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._index = None
+        self._labels = set()
+        self._stamp = None
+        self._lock = threading.RLock()
+
+    @property
+    def enabled(self):
+        return hnswlib is not None and getattr(settings, 'NOTES_HNSW_SEARCH', False)
+
+    def __len__(self):
+        return len(self._labels)
+
+    def _table_stamp(self):
+        from .services import SemanticSearchService
+        return SemanticSearchService.table_stamp()
+
+    def refresh(self):
+        """Rebuild the index if the notes table changed; returns the number of indexed notes."""
+        stamp = self._table_stamp()
+        with self._lock:
+            if self._index is None or stamp != self._stamp:
+                self._rebuild(stamp)
+            return len(self._labels)
+
+    def _rebuild(self, stamp):
+        from .services import SemanticSearchService
+        ids, matrix = SemanticSearchService.get_embedding_matrix()
+        self._index = None
+        self._labels = set()
+        if ids.size:
+            self._init_index(matrix.shape[1], ids.size)
+            self._index.add_items(matrix, ids)
+            self._labels = set(ids.tolist())
+        self._stamp = stamp
+
+    def _init_index(self, dim, capacity):
+        self._index = hnswlib.Index(space='ip', dim=dim)
+        self._index.init_index(
+            max_elements=max(capacity, 16),
+            ef_construction=self.ef_construction,
+            M=self.m,
+        )
+        self._index.set_ef(self.ef_search)
+
+    def query(self, query_vec, top_k):
+        """Return (note ids, scores) of the nearest notes, highest score first."""
+        with self._lock:
+            k = min(top_k, len(self._labels))
+            if self._index is None or k <= 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            self._index.set_ef(max(self.ef_search, k))
+            labels, distances = self._index.knn_query(np.asarray(query_vec, dtype=np.float32), k=k)
+        # hnswlib's 'ip' distance is 1 - <a, b>
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+    def upsert(self, note, created=False):
+        """Add or replace a note's vector (removing it if it has no embedding)."""
+        vector = note.get_embedding_array()
+        with self._lock:
+            if self._index is None:
+                return  # built from the database on the next refresh()
+            if vector is None or vector.size != self._index.dim:
+                self._remove(note.pk)
+            else:
+                if self._index.get_current_count() >= self._index.get_max_elements():
+                    self._index.resize_index(2 * self._index.get_max_elements())
+                # Re-adding a deleted label revives it; an existing one is replaced
+                self._index.add_items(vector[None, :], [note.pk])
+                self._labels.add(note.pk)
+            self._advance_stamp(note.updated_at, 1 if created else 0)
+
+    def remove(self, note):
+        with self._lock:
+            if self._index is None:
+                return
+            self._remove(note.pk)
+            if self._stamp is None:
+                return
+            latest, count = self._stamp
+            # Deleting the most recently updated note lowers the latest updated_at
+            # to a value we cannot know without a query; let refresh() rebuild
+            self._stamp = (latest, count - 1) if note.updated_at != latest else None
+
+    def _advance_stamp(self, updated_at, added):
+        # The table stamp after this save, derived without an aggregate query.
+        # Other processes' writes still make it differ from the real one.
+        if self._stamp is None:
+            return
+        latest, count = self._stamp
+        if updated_at is not None and (latest is None or updated_at > latest):
+            latest = updated_at
+        self._stamp = (latest, count + added)
+
+    def _remove(self, note_id):
+        if note_id in self._labels:
+            self._index.mark_deleted(note_id)
+            self._labels.discard(note_id)
+
+    def save(self):
+        """Write the index and its metadata to self.path, if set."""
+        with self._lock:
+            if not self.path or self._index is None:
+                return
+            latest, count = self._stamp or (None, None)
+            meta = {
+                'stamp': [latest.isoformat() if latest else None, count],
+                'labels': sorted(self._labels),
+                'dim': self._index.dim,
+                'elements': self._index.get_current_count(),
+            }
+            # Every worker saves at exit: write temp files and rename them into
+            # place so readers never see a half-written file
+            _atomic_write(self.path, self._index.save_index)
+            _atomic_write(f"{self.path}.meta", lambda tmp: _write_json(tmp, meta))
+
+    def load(self):
+        """Load a saved index; refresh() rebuilds it if the database has moved on."""
+        if not self.path or not os.path.exists(self.path) or not os.path.exists(f"{self.path}.meta"):
+            return
+        try:
+            with open(f"{self.path}.meta") as fh:
+                meta = json.load(fh)
+            index = hnswlib.Index(space='ip', dim=meta['dim'])
+            index.load_index(str(self.path))
+            index.set_ef(self.ef_search)
+        except Exception:
+            logger.exception("Could not load HNSW index from %s; it will be rebuilt", self.path)
+            return
+        if index.get_current_count() != meta['elements']:
+            # Index and metadata written by different workers
+            logger.warning("HNSW index at %s does not match its metadata; it will be rebuilt", self.path)
+            return
+        latest, count = meta['stamp']
+        stamp = (datetime.datetime.fromisoformat(latest) if latest else None, count)
+        with self._lock:
+            self._index = index
+            self._labels = set(meta['labels'])
+            self._stamp = None if count is None else stamp
+
+
+def _atomic_write(path, write):
+    """Call write(tmp_path) on a temp file beside path, then move it over path."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _write_json(path, data):
+    with open(path, 'w') as fh:
+        json.dump(data, fh)
+
+
+note_index = NoteIndex(path=getattr(settings, 'NOTES_HNSW_PATH', None))
+
+
+def _note_saved(sender, instance, created=False, **kwargs):
+    note_index.upsert(instance, created=created)
+
+
+def _note_deleted(sender, instance, **kwargs):
+    note_index.remove(instance)
+
+
+def connect_signals():
+    from django.db.models.signals import post_delete, post_save
+    from .models import Note
+
+    post_save.connect(_note_saved, sender=Note, dispatch_uid='notes_index_save')
+    post_delete.connect(_note_deleted, sender=Note, dispatch_uid='notes_index_delete')
@@ -4,9 +4,17 @@ Management command to backup the database.
 from django.core.management.base import BaseCommand
 from django.conf import settings
 import os
-import shutil
+import sqlite3
+from contextlib import closing
 from datetime import datetime
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BACKUP_SUFFIXES = ('.sqlite3', '.sqlite3.zst')
+
 
 class Command(BaseCommand):
     help = 'Backup the SQLite database'
@@ -24,10 +32,16 @@ class Command(BaseCommand):
             default=10,
             help='Number of backups to keep (default: 10)',
         )
+        parser.add_argument(
+            '--no-compress',
+            action='store_true',
+            help='Write a plain .sqlite3 file instead of a zstd-compressed .sqlite3.zst',
+        )
 
     def handle(self, *args, **options):
         output_dir = options['output_dir']
         keep_count = options['keep']
+        compress = not options['no_compress']
         
         # Get database path
         db_path = settings.DATABASES['default']['NAME']
@@ -39,14 +53,25 @@ class Command(BaseCommand):
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
         
+        if compress and zstandard is None:
+            self.stdout.write(self.style.WARNING(
+                'zstandard is not installed; writing an uncompressed backup (pip install zstandard)'
+            ))
+            compress = False
+        
         # Generate backup filename with timestamp
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_filename = f'db_backup_{timestamp}.sqlite3'
+        backup_filename = f'db_backup_{timestamp}.sqlite3' + ('.zst' if compress else '')
         backup_path = os.path.join(output_dir, backup_filename)
         
         try:
-            # Copy database file
-            shutil.copy2(db_path, backup_path)
+            # Page-level copy via SQLite's online backup API (consistent even
+            # while the database is being written to)
+            if compress:
+                self._write_compressed_snapshot(db_path, backup_path)
+            else:
+                with closing(sqlite3.connect(db_path)) as source, closing(sqlite3.connect(backup_path)) as target:
+                    source.backup(target)
             
             # Get file size
             file_size = os.path.getsize(backup_path) / (1024 * 1024)  # MB
@@ -61,24 +86,37 @@ class Command(BaseCommand):
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'✗ Backup failed: {e}'))
     
+    def _write_compressed_snapshot(self, db_path, backup_path):
+        """
+        Snapshot the database into memory and write it zstd-compressed.
+        
+        Only the compressed bytes touch the disk; the tradeoff is holding one
+        uncompressed copy of the database in memory while it is written.
+        """
+        with closing(sqlite3.connect(db_path)) as source, closing(sqlite3.connect(':memory:')) as snapshot:
+            source.backup(snapshot)
+            data = snapshot.serialize()
+        cctx = zstandard.ZstdCompressor(level=3, threads=-1)
+        with open(backup_path, 'wb') as dst, cctx.stream_writer(dst) as writer:
+            writer.write(data)
+    
     def _cleanup_old_backups(self, backup_dir, keep_count):
         """Remove old backup files, keeping only the most recent ones."""
         try:
-            # Get all backup files
-            backup_files = [
-                os.path.join(backup_dir, f)
-                for f in os.listdir(backup_dir)
-                if f.startswith('db_backup_') and f.endswith('.sqlite3')
-            ]
+            # Get all backup files (DirEntry caches its stat result)
+            with os.scandir(backup_dir) as it:
+                backup_files = [
+                    entry for entry in it
+                    if entry.name.startswith('db_backup_') and entry.name.endswith(BACKUP_SUFFIXES)
+                ]
             
             # Sort by modification time (newest first)
-            backup_files.sort(key=os.path.getmtime, reverse=True)
+            backup_files.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
             
             # Remove old backups
-            if len(backup_files) > keep_count:
-                for old_backup in backup_files[keep_count:]:
-                    os.remove(old_backup)
-                    self.stdout.write(f'  Removed old backup: {os.path.basename(old_backup)}')
+            for old_backup in backup_files[keep_count:]:
+                os.remove(old_backup.path)
+                self.stdout.write(f'  Removed old backup: {old_backup.name}')
         
         except Exception as e:
             self.stdout.write(self.style.WARNING(f'Warning: Could not clean up old backups: {e}'))
@@ -1,12 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Sequence, Tuple
 from urllib.parse import quote
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
 from notes.models import Note
-from notes.utils import generate_embedding
+from notes.utils import generate_embeddings_batch
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
 
 WIKI_SUMMARY_URL = "https://{lang}.wikipedia.org/api/rest_v1/page/summary/{title}"
 WIKI_RANDOM_URL = "https://{lang}.wikipedia.org/api/rest_v1/page/random/summary"
@@ -35,6 +44,16 @@ HTTP_HEADERS = {
     "Accept": "application/json",
 }
 
+# Concurrent topic fetches; kept small to stay polite to the Wikipedia API
+FETCH_WORKERS = 6
+
+# On-disk cache of Wikipedia responses (requires the optional diskcache package)
+WIKI_CACHE_DIR = getattr(settings, "NOTES_WIKI_CACHE_DIR", settings.BASE_DIR / ".wiki_cache")
+WIKI_CACHE_SIZE_LIMIT = 50_000_000
+WIKI_CACHE_EXPIRE = 7 * 24 * 3600
+
+HTTP_RETRY = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+
 
 class Command(BaseCommand):
     help = "Populate the Notes table with high-quality Wikipedia content."
@@ -71,6 +90,11 @@ class Command(BaseCommand):
             action="store_true",
             help="Fetch and display the notes without writing to the database.",
         )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Bypass the on-disk cache of Wikipedia responses.",
+        )
 
     def handle(self, *args, **options):
         topics = options["topics"]
@@ -85,12 +109,20 @@ class Command(BaseCommand):
 
         topic_source = topics or list(DEFAULT_TOPICS)
 
-        records = self._collect_wikipedia_notes(
-            topic_source=topic_source,
-            use_random=use_random,
-            limit=limit,
-            language=language,
-        )
+        # One pooled session keeps the connection to Wikipedia alive across calls
+        self.session = self._build_session()
+        self.cache = self._open_cache(options["no_cache"])
+        try:
+            records = self._collect_wikipedia_notes(
+                topic_source=topic_source,
+                use_random=use_random,
+                limit=limit,
+                language=language,
+            )
+        finally:
+            self.session.close()
+            if self.cache is not None:
+                self.cache.close()
 
         if not records:
             raise CommandError("Unable to fetch any Wikipedia content.")
@@ -124,37 +156,51 @@ class Command(BaseCommand):
         """Fetch and build (title, content) tuples ready for persistence."""
         results: List[Tuple[str, str]] = []
         seen_titles = set()
+        # Topics whose summary was fetched; only failed fetches are retried
+        done_topics = set()
+        unique_topics = list(dict.fromkeys(topic_source))
         topic_index = 0
         max_attempts = limit * 5  # give ourselves room for network/errors
         attempts = 0
 
-        while len(results) < limit and attempts < max_attempts:
-            attempts += 1
-            topic = None
-            if use_random:
-                summary = self._fetch_random_summary(language)
-            else:
-                topic = topic_source[topic_index % len(topic_source)]
-                topic_index += 1
-                summary = self._fetch_summary(topic, language)
-
-            if not summary:
-                continue
-
-            title = summary.get("title") or topic
-            if not title or title in seen_titles:
-                continue
-
-            content = self._build_content_block(summary, language)
-            if not content or len(content.split()) < 40:
-                continue
-
-            source_url = summary.get("content_urls", {}).get("desktop", {}).get("page")
-            if source_url:
-                content = f"{content}\n\nSource: {source_url}"
-
-            seen_titles.add(title)
-            results.append((title, content))
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            while len(results) < limit and attempts < max_attempts:
+                batch_size = min(limit - len(results), max_attempts - attempts)
+                if use_random:
+                    batch = [None] * batch_size
+                else:
+                    # Each pending topic at most once per batch, rotating through the list
+                    batch = []
+                    for _ in range(len(unique_topics)):
+                        if len(batch) == batch_size:
+                            break
+                        topic = unique_topics[topic_index % len(unique_topics)]
+                        topic_index += 1
+                        if topic not in done_topics:
+                            batch.append(topic)
+                    if not batch:
+                        break  # every topic has been fetched
+                attempts += len(batch)
+
+                # Summaries concurrently; then claim new titles in topic order so
+                # the extract request is only made for titles not collected yet
+                summaries = pool.map(lambda topic: self._fetch_topic_summary(topic, language), batch)
+                claimed = []
+                for topic, summary in zip(batch, summaries):
+                    if not summary:
+                        continue
+                    if topic is not None:
+                        done_topics.add(topic)
+                    title = summary.get("title") or topic
+                    if not title or title in seen_titles:
+                        continue
+                    seen_titles.add(title)
+                    claimed.append((title, summary))
+
+                built = pool.map(lambda item: self._build_note(*item, language), claimed)
+                for note in built:
+                    if note and len(results) < limit:
+                        results.append(note)
 
         if len(results) < limit:
             self.stdout.write(
@@ -165,10 +211,58 @@ class Command(BaseCommand):
 
         return results
 
+    def _fetch_topic_summary(self, topic: Optional[str], language: str) -> Optional[Dict]:
+        """Summary for ``topic``, or for a random page when ``topic`` is None."""
+        if topic is None:
+            return self._fetch_random_summary(language)
+        return self._fetch_summary(topic, language)
+
+    def _build_note(self, title: str, summary: Dict, language: str) -> Optional[Tuple[str, str]]:
+        """Build the (title, content) pair for a summary, fetching its long extract."""
+        content = self._build_content_block(summary, language)
+        if not content or len(content.split()) < 40:
+            return None
+
+        source_url = summary.get("content_urls", {}).get("desktop", {}).get("page")
+        if source_url:
+            content = f"{content}\n\nSource: {source_url}"
+
+        return title, content
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=HTTP_RETRY)
+        session.mount("https://", adapter)
+        session.headers.update(HTTP_HEADERS)
+        return session
+
+    def _open_cache(self, disabled: bool):
+        if disabled:
+            return None
+        if diskcache is None:
+            self.stdout.write("diskcache not installed; Wikipedia responses will not be cached.")
+            return None
+        return diskcache.Cache(str(WIKI_CACHE_DIR), size_limit=WIKI_CACHE_SIZE_LIMIT)
+
+    def _cached(self, key: str, fetch):
+        """Return the cached value for ``key``, fetching and storing it on a miss."""
+        cache = getattr(self, "cache", None)
+        if cache is None:
+            return fetch()
+        value = cache.get(key)
+        if value is None:
+            value = fetch()
+            if value is not None:
+                cache.set(key, value, expire=WIKI_CACHE_EXPIRE)
+        return value
+
     def _fetch_summary(self, topic: str, language: str) -> Optional[Dict]:
-        return self._request_json(
-            WIKI_SUMMARY_URL.format(lang=language, title=quote(topic)),
-            params={"redirect": "true"},
+        return self._cached(
+            f"{language}:{topic}:summary",
+            lambda: self._request_json(
+                WIKI_SUMMARY_URL.format(lang=language, title=quote(topic)),
+                params={"redirect": "true"},
+            ),
         )
 
     def _fetch_random_summary(self, language: str) -> Optional[Dict]:
@@ -176,7 +270,7 @@ class Command(BaseCommand):
 
     def _request_json(self, url: str, params: Optional[Dict] = None) -> Optional[Dict]:
         try:
-            response = requests.get(url, headers=HTTP_HEADERS, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as exc:
@@ -193,7 +287,10 @@ class Command(BaseCommand):
             "exchars": 1400,
             "redirects": 1,
         }
-        data = self._request_json(WIKI_EXTRACT_URL.format(lang=language), params=params)
+        data = self._cached(
+            f"{language}:{title}:extract",
+            lambda: self._request_json(WIKI_EXTRACT_URL.format(lang=language), params=params),
+        )
         if not data:
             return None
 
@@ -226,20 +323,25 @@ class Command(BaseCommand):
 
     @transaction.atomic
     def _persist_notes(self, records: List[Tuple[str, str]]) -> Tuple[int, int]:
-        created = 0
-        updated = 0
-
-        for title, content in records:
-            note, was_created = Note.objects.get_or_create(title=title, defaults={"content": content})
-            if not was_created:
-                note.content = content
-                updated += 1
+        # Titles are not unique; when duplicates exist, update the oldest note like get_or_create would
+        existing: Dict[str, Note] = {}
+        for note in Note.objects.filter(title__in=[title for title, _ in records]).order_by("pk"):
+            existing.setdefault(note.title, note)
+
+        embeddings = generate_embeddings_batch([content for _, content in records])
+
+        to_create: List[Note] = []
+        to_update: List[Note] = []
+        for (title, content), embedding in zip(records, embeddings):
+            note = existing.get(title)
+            if note is None:
+                note = Note(title=title, content=content)
+                to_create.append(note)
             else:
-                created += 1
-
-            embedding = generate_embedding(content)
+                note.content = content
+                to_update.append(note)
             note.set_embedding_list(embedding)
-            note.save()
-
-        return created, updated
 
+        Note.objects.bulk_create(to_create, batch_size=500)
+        Note.objects.bulk_update_embeddings(to_update, ["content", "embedding"], batch_size=500)
+        return len(to_create), len(to_update)
@@ -3,9 +3,8 @@ Management command to regenerate embeddings for notes.
 """
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from django.db.models import Q
 from notes.models import Note
-from notes.utils import generate_embedding
+from notes.utils import generate_embeddings_batch
 from django.contrib import messages
 import sys
 
@@ -51,9 +50,7 @@ class Command(BaseCommand):
             notes = Note.objects.all()
             self.stdout.write(self.style.WARNING('Regenerating embeddings for ALL notes...'))
         else:
-            notes = Note.objects.filter(
-                Q(embedding='') | Q(embedding__isnull=True)
-            )
+            notes = Note.objects.filter(embedding=b'')
             self.stdout.write('Regenerating embeddings for notes without embeddings...')
         
         total_count = notes.count()
@@ -71,33 +68,20 @@ class Command(BaseCommand):
         processed = 0
         errors = 0
         
-        # Process in batches
-        for i in range(0, total_count, batch_size):
-            batch = notes[i:i+batch_size]
+        # Keyset pagination on pk: each batch is an indexed range scan, and rows
+        # that gain an embedding mid-run cannot shift later pages (as OFFSET did)
+        notes = notes.only('id', 'content').order_by('pk')
+        last_pk = 0
+        while True:
+            batch = list(notes.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
             
-            with transaction.atomic():
-                for note in batch:
-                    try:
-                        if not note.content:
-                            self.stdout.write(
-                                self.style.WARNING(f'  Skipping note {note.id}: empty content')
-                            )
-                            continue
-                        
-                        embedding = generate_embedding(note.content)
-                        note.set_embedding_list(embedding)
-                        note.save(update_fields=['embedding'])
-                        
-                        processed += 1
-                        
-                        if processed % 10 == 0:
-                            self.stdout.write(f'  Processed {processed}/{total_count}...')
-                    
-                    except Exception as e:
-                        errors += 1
-                        self.stdout.write(
-                            self.style.ERROR(f'  Error processing note {note.id}: {e}')
-                        )
+            batch_processed, batch_errors = self._process_batch(batch)
+            processed += batch_processed
+            errors += batch_errors
+            self.stdout.write(f'  Processed {processed}/{total_count}...')
         
         # Summary
         self.stdout.write('\n' + '='*50)
@@ -106,4 +90,44 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'✗ Errors: {errors}'))
         else:
             self.stdout.write(self.style.SUCCESS('✓ No errors'))
-
+    
+    def _process_batch(self, notes):
+        """Embed one batch of notes and write them back; returns (processed, errors)."""
+        batch = []
+        for note in notes:
+            if not note.content:
+                self.stdout.write(
+                    self.style.WARNING(f'  Skipping note {note.id}: empty content')
+                )
+                continue
+            batch.append(note)
+        
+        if not batch:
+            return 0, 0
+        
+        # One forward pass per batch; encode() already length-sorts internally
+        try:
+            embeddings = generate_embeddings_batch([note.content for note in batch])
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'  Error embedding batch of {len(batch)} notes: {e}')
+            )
+            return 0, len(batch)
+        
+        updated = []
+        errors = 0
+        for note, embedding in zip(batch, embeddings):
+            try:
+                note.set_embedding_list(embedding)
+            except Exception as e:
+                errors += 1
+                self.stdout.write(
+                    self.style.ERROR(f'  Error processing note {note.id}: {e}')
+                )
+                continue
+            updated.append(note)
+        
+        with transaction.atomic():
+            Note.objects.bulk_update_embeddings(updated, batch_size=500)
+        
+        return len(updated), errors
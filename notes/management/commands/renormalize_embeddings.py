@@ -0,0 +1,76 @@
+"""
+Management command to L2-normalize stored embeddings.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+import numpy as np
+from notes.models import Note
+
+
+class Command(BaseCommand):
+    help = 'Re-normalize stored embeddings to unit length (search scores them with a plain dot product)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of notes to read and update per batch (default: 1000)',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=1e-4,
+            help='Leave rows whose norm is within this distance of 1 (default: 1e-4)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be done without actually doing it',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        tolerance = options['tolerance']
+        dry_run = options['dry_run']
+
+        # Keyset batches on pk, flushed as we go, so memory stays bounded by one batch
+        rows = Note.objects.with_embedding().only('id', 'embedding').order_by('pk')
+        normalized = 0
+        degenerate = []
+        last_pk = 0
+        while True:
+            batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            pending = []
+            for note in batch:
+                vector = note.get_embedding_array()
+                norm = float(np.linalg.norm(vector))
+                if norm == 0:
+                    degenerate.append(note.id)
+                elif abs(norm - 1.0) > tolerance:
+                    note.embedding = (vector / norm).tobytes()
+                    pending.append(note)
+
+            if pending and not dry_run:
+                self._flush(pending)
+            normalized += len(pending)
+
+        if degenerate:
+            self.stdout.write(
+                self.style.WARNING(f'Skipping {len(degenerate)} zero-norm embeddings: {degenerate[:10]}')
+            )
+
+        if not normalized:
+            self.stdout.write(self.style.SUCCESS('All embeddings are already normalized.'))
+        elif dry_run:
+            self.stdout.write(self.style.WARNING(f'DRY RUN: Would normalize {normalized} embeddings'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✓ Normalized {normalized} embeddings'))
+
+    def _flush(self, notes):
+        with transaction.atomic():
+            Note.objects.bulk_update_embeddings(notes)
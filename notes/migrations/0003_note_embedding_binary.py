@@ -0,0 +1,50 @@
+# Generated by Django 5.0 on 2026-10-14 09:00
+
+import json
+
+import numpy as np
+from django.db import migrations, models
+
+
+def json_to_binary(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    for note in Note.objects.exclude(embedding='').only('id', 'embedding'):
+        try:
+            vector = json.loads(note.embedding)
+        except (ValueError, TypeError):
+            continue
+        note.embedding_bin = np.asarray(vector, dtype=np.float32).tobytes()
+        note.save(update_fields=['embedding_bin'])
+
+
+def binary_to_json(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    for note in Note.objects.exclude(embedding_bin=b'').only('id', 'embedding_bin'):
+        vector = np.frombuffer(note.embedding_bin, dtype=np.float32).tolist()
+        note.embedding = json.dumps(vector)
+        note.save(update_fields=['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0002_note_title'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='embedding_bin',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.RunPython(json_to_binary, binary_to_json),
+        migrations.RemoveField(
+            model_name='note',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='note',
+            old_name='embedding_bin',
+            new_name='embedding',
+        ),
+    ]
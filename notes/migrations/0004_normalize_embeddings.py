@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-14 09:30
+
+import numpy as np
+from django.db import migrations
+
+
+def normalize_embeddings(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    for note in Note.objects.exclude(embedding=b'').only('id', 'embedding'):
+        vector = np.frombuffer(note.embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            note.embedding = (vector / norm).astype(np.float32).tobytes()
+            note.save(update_fields=['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0003_note_embedding_binary'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_embeddings, migrations.RunPython.noop),
+    ]
@@ -1,27 +1,66 @@
 from django.db import models
-import json
+from django.db.models import Q
+from django.utils import timezone
+import numpy as np
+
+
+# Matches the notes_has_emb partial index condition, so filters using it can be served by the index
+HAS_EMBEDDING = ~Q(embedding=b'')
+
+
+class NoteQuerySet(models.QuerySet):
+    def with_embedding(self):
+        """Notes that have a stored embedding."""
+        return self.filter(HAS_EMBEDDING)
+
+    def bulk_update_embeddings(self, notes, fields=('embedding',), batch_size=None):
+        """
+        bulk_update() that also bumps updated_at on every note.
+        
+        bulk_update skips auto_now, and the search caches key on the latest
+        updated_at; use this for bulk writes to notes so those caches rebuild.
+        """
+        now = timezone.now()
+        for note in notes:
+            note.updated_at = now
+        return self.bulk_update(notes, [*fields, 'updated_at'], batch_size=batch_size)
 
 
 class Note(models.Model):
-    title = models.TextField()
+    title = models.CharField(max_length=255, db_index=True)
     content = models.TextField()
-    embedding = models.TextField(blank=True)  # Stored as JSON string
+    embedding = models.BinaryField(blank=True, default=b'')  # Stored as raw float32 bytes
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = NoteQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['updated_at'], name='notes_updated_at_idx'),
+            # Partial index over notes that have an embedding (search scans only these)
+            models.Index(fields=['id'], name='notes_has_emb', condition=HAS_EMBEDDING),
+        ]
 
     def __str__(self):
         return self.content[:50] + ('...' if len(self.content) > 50 else '')
 
-    def get_embedding_list(self):
-        """Convert embedding JSON string to list."""
+    def get_embedding_array(self):
+        """Return the embedding as a read-only float32 array viewing the stored bytes."""
         if self.embedding:
-            return json.loads(self.embedding)
+            return np.frombuffer(self.embedding, dtype=np.float32)
         return None
 
-    def set_embedding_list(self, embedding_list):
-        """Convert embedding list to JSON string."""
-        self.embedding = json.dumps(embedding_list)
+    def get_embedding_list(self):
+        """Convert embedding float32 bytes to list."""
+        vector = self.get_embedding_array()
+        return vector.tolist() if vector is not None else None
 
+    def set_embedding_list(self, embedding_list):
+        """L2-normalize the embedding and store it as float32 bytes."""
+        vector = np.asarray(embedding_list, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            raise ValueError("degenerate embedding (zero norm)")
+        self.embedding = (vector / norm).tobytes()
@@ -1,11 +1,49 @@
 """
 Semantic search and AI services for notes.
 """
-import json
+import re
+import threading
 import numpy as np
 from typing import List, Tuple, Optional
+from django.conf import settings
+from django.db.models import Count, Max
 from .models import Note
-from .utils import generate_embedding
+from .utils import generate_embedding, quantize_int8_scaled, top_k_indices
+from ._simkernel import NUMBA_AVAILABLE, int8_dot_scores
+from .index import note_index
+
+# Only import faiss when FAISS search is enabled; loading it is not free
+faiss = None
+if getattr(settings, 'NOTES_FAISS_SEARCH', False):
+    try:
+        import faiss
+    except ImportError:
+        pass
+
+# Process-level search cache, rebuilt only when the notes table changes
+# (see SemanticSearchService.get_embedding_matrix):
+#   "stamp"  table_stamp() the entries below were built from
+#   "ids"    note ids, one per row of M
+#   "M"      the L2-normalized float32 embedding matrix
+#   "M_i8"   int8 codes of M with their per-row scales, built lazily for the int8 scan
+#   "faiss"  FAISS index over M, built lazily when FAISS search is enabled
+_EMB_CACHE = {"stamp": None, "ids": None, "M": None, "M_i8": None, "faiss": None}
+# Serializes rebuilds so concurrent requests after a write build the matrix once
+_EMB_CACHE_LOCK = threading.Lock()
+
+# Fixed instruction that opens every Gemma prompt (see AIService._generate_with_prefix_cache)
+GEMMA_PROMPT_PREFIX = """You are a helpful assistant. 
+Answer the question based ONLY on the provided notes.
+
+NOTES:
+"""
+
+# Sentence boundaries for the keyword fallback answer: whitespace after
+# terminal punctuation, except after common abbreviations ("Dr. Smith")
+SENTENCE_ABBREVIATIONS = ('Mr', 'Mrs', 'Ms', 'Dr', 'Prof', 'St', 'Jr', 'Sr', 'vs', 'etc', 'e.g', 'i.e')
+SENTENCE_SPLIT_RE = re.compile(
+    ''.join(rf'(?<!\b{re.escape(abbr)}\.)' for abbr in SENTENCE_ABBREVIATIONS) + r'(?<=[.!?])\s+'
+)
 
 
 class SemanticSearchService:
@@ -14,6 +52,17 @@ class SemanticSearchService:
     SIMILARITY_THRESHOLD = 0.15
     DEFAULT_TOP_K = 10
     
+    # Scan an int8 copy of the matrix and rescore a shortlist in float32.
+    # Defaults to on when the Numba int8 kernel is available.
+    INT8_SEARCH = getattr(settings, 'NOTES_INT8_SEARCH', NUMBA_AVAILABLE)
+    INT8_OVERSAMPLE = 4
+    
+    # Search through a FAISS index instead (opt-in; requires faiss). Exact
+    # IndexFlatIP below FAISS_IVF_THRESHOLD rows, IndexIVFFlat above it.
+    FAISS_SEARCH = faiss is not None
+    FAISS_IVF_THRESHOLD = 50_000
+    FAISS_NPROBE = 32
+    
     @staticmethod
     def find_relevant_notes(query: str, top_k: int = None, threshold: float = None) -> List[Tuple[int, float, str]]:
         """
@@ -30,36 +79,173 @@ class SemanticSearchService:
         top_k = top_k or SemanticSearchService.DEFAULT_TOP_K
         threshold = threshold or SemanticSearchService.SIMILARITY_THRESHOLD
         
-        # Generate query embedding
-        query_vec = np.array(generate_embedding(query))
+        query_vec = np.asarray(generate_embedding(query), dtype=np.float32)
         query_norm = np.linalg.norm(query_vec)
         
         if query_norm == 0:
             return []
         
-        # Fetch notes with embeddings
-        rows = Note.objects.exclude(embedding='').exclude(embedding__isnull=True).values_list('id', 'embedding', 'content')
-        scored_notes = []
+        if note_index.enabled:
+            if not note_index.refresh():
+                return []
+            hit_ids, scores = note_index.query(query_vec / query_norm, top_k)
+        else:
+            ids, matrix = SemanticSearchService.get_embedding_matrix()
+            if not matrix.size or matrix.shape[1] != query_vec.size:
+                return []
+            
+            # One scan over the cached matrix instead of a per-row Python loop
+            idx, scores = SemanticSearchService.top_matches(query_vec / query_norm, matrix, top_k)
+            hit_ids = ids[idx]
         
-        for note_id, emb_str, content in rows:
-            if not emb_str or not content:
-                continue
-                
-            try:
-                vec = json.loads(emb_str)
-                if vec and isinstance(vec, list) and len(vec) > 0:
-                    note_vec = np.array(vec)
-                    note_norm = np.linalg.norm(note_vec)
-                    if note_norm > 0:
-                        score = np.dot(note_vec, query_vec) / (note_norm * query_norm)
-                        if score >= threshold:
-                            scored_notes.append((note_id, score, content))
-            except (ValueError, TypeError, json.JSONDecodeError):
-                continue
-        
-        # Sort by score (highest first) and return top K
-        scored_notes.sort(key=lambda x: x[1], reverse=True)
-        return scored_notes[:top_k]
+        keep = scores >= threshold
+        top_ids = hit_ids[keep].tolist()
+        top_scores = scores[keep].tolist()
+        
+        contents = dict(Note.objects.filter(pk__in=top_ids).values_list('id', 'content'))
+        return [
+            (note_id, score, contents[note_id])
+            for note_id, score in zip(top_ids, top_scores)
+            if contents.get(note_id)
+        ]
+    
+    @staticmethod
+    def table_stamp() -> tuple:
+        """(latest updated_at, note count): changes whenever notes are saved, added or deleted."""
+        stamp = Note.objects.aggregate(m=Max('updated_at'), c=Count('id'))
+        return stamp['m'], stamp['c']
+    
+    @staticmethod
+    def get_embedding_matrix() -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the cached embedding matrix for all notes with embeddings.
+        
+        Stored embeddings are L2-normalized, so cosine similarity against a
+        normalized query is a single matrix-vector product. The matrix is
+        rebuilt whenever the latest `updated_at` or the note count changes.
+        
+        Returns:
+            Tuple of (ids array, (N, D) float32 matrix)
+        """
+        stamp = SemanticSearchService.table_stamp()
+        if _EMB_CACHE["stamp"] == stamp:
+            return _EMB_CACHE["ids"], _EMB_CACHE["M"]
+        with _EMB_CACHE_LOCK:
+            # Another thread may have rebuilt it while we waited
+            if _EMB_CACHE["stamp"] == stamp:
+                return _EMB_CACHE["ids"], _EMB_CACHE["M"]
+            return SemanticSearchService._build_embedding_matrix(stamp)
+    
+    @staticmethod
+    def _build_embedding_matrix(stamp) -> Tuple[np.ndarray, np.ndarray]:
+        # Stream rows instead of materializing every bytes object at once. The
+        # note count in the stamp bounds N, so the (N, D) block is allocated on
+        # the first row (which fixes D; rows of another length are skipped)
+        rows = (
+            Note.objects.with_embedding()
+            .order_by()  # row order is irrelevant; skip sorting the table by Meta.ordering
+            .values_list('id', 'embedding')
+            .iterator(chunk_size=1000)
+        )
+        capacity = stamp[1]
+        matrix = None
+        count = 0
+        for note_id, emb_bytes in rows:
+            if matrix is None:
+                row_bytes = len(emb_bytes)
+                matrix = np.empty((capacity, row_bytes // 4), dtype=np.float32)
+                ids = np.empty(capacity, dtype=np.int64)
+            if count == capacity:
+                break  # rows added since the stamp; the next call sees a new count and rebuilds
+            if len(emb_bytes) == row_bytes:
+                matrix[count] = np.frombuffer(emb_bytes, dtype=np.float32)
+                ids[count] = note_id
+                count += 1
+        
+        if matrix is not None:
+            # Rows are already unit length and never zero (Note.set_embedding_list
+            # normalizes and rejects degenerate vectors), so no norm fixups here.
+            # The stamp also counts notes without embeddings; copy so a trimmed
+            # view does not keep the oversized block alive.
+            if count < capacity:
+                matrix = matrix[:count].copy()
+                ids = ids[:count].copy()
+        else:
+            matrix = np.empty((0, 0), dtype=np.float32)
+            ids = np.empty(0, dtype=np.int64)
+        
+        _EMB_CACHE.update(stamp=stamp, ids=ids, M=matrix, M_i8=None, faiss=None)
+        return _EMB_CACHE["ids"], _EMB_CACHE["M"]
+    
+    @staticmethod
+    def top_matches(query_vec: np.ndarray, matrix: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the best-scoring rows of the embedding matrix.
+        
+        Args:
+            query_vec: L2-normalized query embedding
+            matrix: Matrix from get_embedding_matrix()
+            top_k: Number of rows to return
+            
+        Returns:
+            Tuple of (row indices, cosine scores), highest score first
+        """
+        if not matrix.size:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        
+        if SemanticSearchService.FAISS_SEARCH:
+            index = SemanticSearchService._get_faiss_index(matrix)
+            scores, idx = index.search(np.ascontiguousarray(query_vec[None, :], dtype=np.float32), top_k)
+            found = idx[0] >= 0  # IVF pads with -1 when probed lists hold fewer than k rows
+            return idx[0][found].astype(np.intp), scores[0][found]
+        
+        if SemanticSearchService.INT8_SEARCH:
+            if _EMB_CACHE["M"] is matrix and _EMB_CACHE["M_i8"] is not None:
+                matrix_i8, row_scales = _EMB_CACHE["M_i8"]
+            else:
+                matrix_i8, row_scales = quantize_int8_scaled(matrix)
+                if _EMB_CACHE["M"] is matrix:
+                    _EMB_CACHE["M_i8"] = (matrix_i8, row_scales)
+            # Coarse scan with int32 accumulation, then exact rescoring of the shortlist.
+            # The query's own scale is a constant factor, so it does not affect ranking.
+            query_i8, _ = quantize_int8_scaled(query_vec)
+            if NUMBA_AVAILABLE:
+                dots = np.empty(matrix_i8.shape[0], dtype=np.int32)
+                int8_dot_scores(matrix_i8, query_i8, dots)
+            else:
+                dots = np.einsum(
+                    'ij,j->i', matrix_i8, query_i8.astype(np.int32),
+                    dtype=np.int32, casting='unsafe',
+                )
+            approx = dots * row_scales
+            candidates = top_k_indices(approx, top_k * SemanticSearchService.INT8_OVERSAMPLE)
+            exact = matrix[candidates] @ query_vec
+            order = top_k_indices(exact, top_k)
+            return candidates[order], exact[order]
+        
+        scores = matrix @ query_vec
+        idx = top_k_indices(scores, top_k)
+        return idx, scores[idx]
+    
+    @staticmethod
+    def _get_faiss_index(matrix: np.ndarray):
+        """Return a FAISS inner-product index over matrix, cached alongside it."""
+        if _EMB_CACHE["M"] is matrix and _EMB_CACHE["faiss"] is not None:
+            return _EMB_CACHE["faiss"]
+        
+        n_rows, dim = matrix.shape
+        if n_rows >= SemanticSearchService.FAISS_IVF_THRESHOLD:
+            quantizer = faiss.IndexFlatIP(dim)
+            index = faiss.IndexIVFFlat(quantizer, dim, int(np.sqrt(n_rows)), faiss.METRIC_INNER_PRODUCT)
+            index.train(matrix)
+            index.nprobe = SemanticSearchService.FAISS_NPROBE
+        else:
+            index = faiss.IndexFlatIP(dim)
+        index.add(matrix)
+        
+        if _EMB_CACHE["M"] is matrix:
+            _EMB_CACHE["faiss"] = index
+        return index
     
     @staticmethod
     def get_semantic_search_results(query: str, top_k: int = 10) -> Tuple[List[int], dict]:
@@ -80,11 +266,42 @@ class SemanticSearchService:
         return note_ids, scores_dict
 
 
+def invalidate_embedding_cache(**kwargs):
+    """Drop the cached matrix; connected to Note post_save/post_delete in NotesConfig.ready."""
+    with _EMB_CACHE_LOCK:
+        _EMB_CACHE.update(stamp=None, ids=None, M=None, M_i8=None, faiss=None)
+
+
 class AIService:
     """Service for AI-powered answer generation using Gemma."""
     
     _gemma_pipeline = None
     
+    # 4-bit NF4 weights via bitsandbytes (CUDA only, used when installed)
+    QUANTIZE_4BIT = getattr(settings, 'NOTES_GEMMA_4BIT', True)
+    # torch.compile the model; first calls pay the compile cost, so opt-in
+    COMPILE_MODEL = getattr(settings, 'NOTES_GEMMA_COMPILE', False)
+    # Reuse the KV cache of the fixed instruction prefix across generations
+    PREFIX_CACHE = getattr(settings, 'NOTES_GEMMA_PREFIX_CACHE', True)
+    _prefix_cache = None
+    _prefix_cache_failed = False
+    
+    @classmethod
+    def _get_quantization_config(cls, torch):
+        """Return a 4-bit BitsAndBytesConfig, or None when unavailable or disabled."""
+        if not cls.QUANTIZE_4BIT or not torch.cuda.is_available():
+            return None
+        try:
+            import bitsandbytes  # noqa: F401
+            from transformers import BitsAndBytesConfig
+        except ImportError:
+            return None
+        return BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_compute_dtype=torch.bfloat16,
+            bnb_4bit_quant_type="nf4",
+        )
+    
     @classmethod
     def _get_gemma_pipeline(cls):
         """Lazy load Gemma pipeline."""
@@ -93,13 +310,31 @@ class AIService:
                 import torch
                 from transformers import pipeline
                 
+                model_kwargs = {"torch_dtype": torch.bfloat16}
+                quantization_config = cls._get_quantization_config(torch)
+                if quantization_config is not None:
+                    model_kwargs["quantization_config"] = quantization_config
+                
                 print("Loading Gemma model...")
                 cls._gemma_pipeline = pipeline(
                     "text-generation",
                     model="google/gemma-3-1b-it",  # Using smaller model for faster inference
-                    model_kwargs={"torch_dtype": torch.bfloat16},
+                    model_kwargs=model_kwargs,
                     device_map="auto"
                 )
+                
+                tokenizer = cls._gemma_pipeline.tokenizer
+                tokenizer.padding_side = "left"
+                if tokenizer.pad_token_id is None:
+                    tokenizer.pad_token_id = tokenizer.eos_token_id
+                
+                if cls.COMPILE_MODEL and torch.cuda.is_available():
+                    try:
+                        cls._gemma_pipeline.model = torch.compile(
+                            cls._gemma_pipeline.model, mode="reduce-overhead"
+                        )
+                    except Exception as e:
+                        print(f"Warning: torch.compile failed, using eager model: {e}")
                 print("Gemma model loaded successfully.")
                 print(f"Pipeline type: {type(cls._gemma_pipeline)}")
             except Exception as e:
@@ -145,16 +380,21 @@ class AIService:
         messages = [
             {
                 "role": "user", 
-                "content": f"""You are a helpful assistant. 
-Answer the question based ONLY on the provided notes.
-
-NOTES:
-- {context_block}
+                "content": f"""{GEMMA_PROMPT_PREFIX}- {context_block}
 
 QUESTION: {question}"""
             }
         ]
         
+        if cls.PREFIX_CACHE and not cls._prefix_cache_failed:
+            try:
+                answer = cls._generate_with_prefix_cache(messages, gemma_pipe)
+                if answer:
+                    return answer
+            except Exception as e:
+                print(f"Prefix-cached generation failed: {e}, using the pipeline")
+                cls._prefix_cache_failed = True
+        
         outputs = gemma_pipe(messages, max_new_tokens=200, do_sample=False)
         
         # Extract the generated text (matching decoder.py format exactly)
@@ -178,30 +418,80 @@ QUESTION: {question}"""
         # Fallback if extraction fails
         return cls._generate_simple_answer(question, relevant_notes)
     
+    @classmethod
+    def _generate_with_prefix_cache(cls, messages, gemma_pipe) -> Optional[str]:
+        """
+        Generate with the KV cache of GEMMA_PROMPT_PREFIX reused across calls.
+        
+        The prefix is prefilled once; each call deep-copies that cache (generate
+        extends it in place) and only the notes and question are prefilled.
+        Returns None when the prompt does not start with the cached tokens.
+        """
+        import copy
+        import torch
+        
+        tokenizer = gemma_pipe.tokenizer
+        model = gemma_pipe.model
+        prompt = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        split = prompt.find(GEMMA_PROMPT_PREFIX)
+        if split < 0:
+            return None
+        split += len(GEMMA_PROMPT_PREFIX)
+        
+        # The chat template already renders <bos>, so no extra special tokens
+        input_ids = tokenizer(prompt, add_special_tokens=False, return_tensors="pt").input_ids.to(model.device)
+        if cls._prefix_cache is None:
+            prefix_ids = tokenizer(
+                prompt[:split], add_special_tokens=False, return_tensors="pt"
+            ).input_ids.to(model.device)
+            with torch.no_grad():
+                cache = model(prefix_ids, use_cache=True).past_key_values
+            cls._prefix_cache = (prefix_ids, cache)
+        
+        prefix_ids, cache = cls._prefix_cache
+        prefix_len = prefix_ids.shape[1]
+        if input_ids.shape[1] <= prefix_len or not torch.equal(input_ids[0, :prefix_len], prefix_ids[0]):
+            return None
+        
+        outputs = model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            past_key_values=copy.deepcopy(cache),
+            max_new_tokens=200,
+            do_sample=False,
+            pad_token_id=tokenizer.pad_token_id,
+        )
+        answer = tokenizer.decode(outputs[0, input_ids.shape[1]:], skip_special_tokens=True)
+        return answer.strip() or None
+    
     @classmethod
     def _generate_simple_answer(cls, question: str, relevant_notes: List[str]) -> str:
         """Generate a simple answer without AI model (fallback)."""
         if not relevant_notes:
             return "I don't have enough information to answer that question."
         
-        # Extract relevant sentences based on question keywords
-        question_words = set(question.lower().split())
+        # Extract relevant sentences based on question keywords, using one
+        # compiled alternation instead of a word set per sentence
+        question_words = {w for w in re.findall(r'\w+', question.lower()) if len(w) > 2}
         answer_parts = []
         
-        for note in relevant_notes:
-            sentences = note.split('. ')
-            for sentence in sentences:
-                sentence_words = set(sentence.lower().split())
-                if len(question_words & sentence_words) > 0:
-                    answer_parts.append(sentence.strip())
-                    if len(answer_parts) >= 5:
-                        break
-            if len(answer_parts) >= 5:
-                break
+        if question_words:
+            pattern = re.compile(
+                r'\b(?:' + '|'.join(re.escape(w) for w in question_words) + r')\b',
+                re.IGNORECASE,
+            )
+            for note in relevant_notes:
+                for sentence in SENTENCE_SPLIT_RE.split(note):
+                    if pattern.search(sentence):
+                        answer_parts.append(sentence.strip())
+                        if len(answer_parts) >= 5:
+                            break
+                if len(answer_parts) >= 5:
+                    break
         
         if answer_parts:
-            answer = '. '.join(answer_parts)
-            if not answer.endswith('.'):
+            answer = ' '.join(answer_parts)
+            if not answer.endswith(('.', '!', '?')):
                 answer += '.'
             return answer
         else:
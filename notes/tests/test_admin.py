@@ -94,3 +94,120 @@ class TestNoteAdmin:
         result = note_admin.embedding_preview(note)
         assert result == "Missing"
 
+    def test_save_model_skips_embedding_for_metadata_edit(self, note_admin, mock_request, monkeypatch, db):
+        """Test that a title-only edit keeps the stored embedding without re-encoding."""
+        note = Note(title="Test", content="Content")
+        note.set_embedding_list([1.0, 0.0])
+        note.save()
+        stored = note.embedding
+        
+        def fail(text):
+            raise AssertionError("generate_embedding should not be called")
+        monkeypatch.setattr('notes.admin.generate_embedding', fail)
+        
+        class Form:
+            changed_data = ['title']
+        
+        note.title = "Renamed"
+        note_admin.save_model(mock_request, note, Form(), change=True)
+        note.refresh_from_db()
+        assert note.title == "Renamed"
+        assert note.embedding == stored
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestSemanticSearchAdmin:
+    """Semantic search through NoteAdmin (query encoding stubbed out)."""
+    
+    QUERY_VECTOR = [1.0, 0.0, 0.0]
+    
+    @pytest.fixture
+    def encoded(self, monkeypatch):
+        """Record every query the admin encodes."""
+        calls = []
+        
+        def fake_generate_embedding(text):
+            calls.append(text)
+            return list(self.QUERY_VECTOR)
+        monkeypatch.setattr('notes.admin.generate_embedding', fake_generate_embedding)
+        return calls
+    
+    @pytest.fixture
+    def ranked_notes(self):
+        """Notes created most-similar first, so -created_at is the reverse of relevance."""
+        notes = {}
+        for name, vector in [('best', [1.0, 0.0, 0.0]), ('mid', [0.8, 0.6, 0.0]),
+                             ('low', [0.6, 0.8, 0.0]), ('far', [0.0, 0.0, 1.0])]:
+            note = Note(title=name, content=f"{name} content")
+            note.set_embedding_list(vector)
+            note.save()
+            notes[name] = note
+        return notes
+    
+    @pytest.fixture
+    def search_request(self, admin_user):
+        from conftest import add_messages_support
+        request = RequestFactory().get('/admin/notes/note/', {'q': 'query'})
+        request.user = admin_user
+        return add_messages_support(request)
+    
+    @pytest.fixture
+    def note_admin(self):
+        return NoteAdmin(Note, AdminSite())
+    
+    def test_queryset_ordered_by_similarity(self, note_admin, encoded, ranked_notes, search_request):
+        """Test that results come back most similar first, dropping low scores."""
+        titles = [note.title for note in note_admin.get_queryset(search_request)]
+        assert titles == ['best', 'mid', 'low']
+    
+    def test_changelist_keeps_similarity_order(self, note_admin, encoded, ranked_notes, search_request):
+        """Test that the changelist does not re-sort results by Meta.ordering."""
+        changelist = note_admin.get_changelist_instance(search_request)
+        assert [note.title for note in changelist.queryset] == ['best', 'mid', 'low']
+    
+    def test_changelist_column_sort_wins(self, note_admin, encoded, ranked_notes, admin_user):
+        """Test that an explicit column sort still overrides the similarity order."""
+        from conftest import add_messages_support
+        request = RequestFactory().get('/admin/notes/note/', {'q': 'query', 'o': '-1'})  # by id, descending
+        request.user = admin_user
+        request = add_messages_support(request)
+        changelist = note_admin.get_changelist_instance(request)
+        assert [note.title for note in changelist.queryset] == ['low', 'mid', 'best']
+    
+    def test_ranking_is_memoized_per_request(self, note_admin, encoded, ranked_notes, search_request, monkeypatch):
+        """Test that repeated get_queryset/match_score calls in one request do not re-encode or re-score."""
+        from notes.services import SemanticSearchService
+        scored = []
+        original_top_matches = SemanticSearchService.top_matches
+        
+        def counting_top_matches(*args, **kwargs):
+            scored.append(1)
+            return original_top_matches(*args, **kwargs)
+        monkeypatch.setattr(SemanticSearchService, 'top_matches', staticmethod(counting_top_matches))
+        
+        first = list(note_admin.get_queryset(search_request))
+        changelist = note_admin.get_changelist_instance(search_request)
+        second = list(changelist.queryset)
+        badges = [note_admin.match_score(note) for note in second]
+        
+        assert [note.pk for note in second] == [note.pk for note in first]
+        assert all('%' in badge for badge in badges)
+        assert encoded == ['query']
+        assert len(scored) == 1
+    
+    def test_new_query_is_not_served_from_memo(self, note_admin, encoded, ranked_notes, search_request):
+        """Test that the memo is keyed by the query text."""
+        note_admin.get_queryset(search_request)
+        search_request.GET = search_request.GET.copy()
+        search_request.GET['q'] = 'another query'
+        note_admin.get_queryset(search_request)
+        assert encoded == ['query', 'another query']
+    
+    def test_ordering_without_search(self, note_admin, admin_user, ranked_notes):
+        """Test that the changelist falls back to newest first when no search is active."""
+        from conftest import add_messages_support
+        request = RequestFactory().get('/admin/notes/note/')
+        request.user = admin_user
+        changelist = note_admin.get_changelist_instance(add_messages_support(request))
+        assert [note.title for note in changelist.queryset] == ['far', 'low', 'mid', 'best']
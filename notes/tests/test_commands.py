@@ -0,0 +1,306 @@
+"""
+Unit tests for the notes management commands.
+"""
+import itertools
+import os
+import sqlite3
+from contextlib import closing
+from io import StringIO
+import pytest
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from notes.management.commands import (
+    backup_database, populate_notes, regenerate_embeddings, renormalize_embeddings,
+)
+from notes.models import Note
+from notes.services import SemanticSearchService
+
+
+LOREM = " ".join(f"word{i}" for i in range(50))
+
+
+@pytest.mark.unit
+class TestPopulateNotesFetching:
+    """Wikipedia fetching in populate_notes (network stubbed out)."""
+
+    @pytest.fixture
+    def command(self, monkeypatch):
+        """A populate_notes command whose HTTP requests are recorded, not sent."""
+        command = populate_notes.Command()
+        command.cache = None
+        command.requests = []
+        # Topics that redirect to another page title
+        command.redirects = {"Blackhole": "Black holes"}
+        random_ids = itertools.count()  # next() is atomic across the fetch threads
+
+        def fake_request_json(url, params=None):
+            if url.startswith(populate_notes.WIKI_EXTRACT_URL.format(lang="en")):
+                command.requests.append(("extract", params["titles"]))
+                return {"query": {"pages": {"1": {"extract": f"{params['titles']} long extract."}}}}
+            if url == populate_notes.WIKI_RANDOM_URL.format(lang="en"):
+                command.requests.append(("random", None))
+                title = f"Random page {next(random_ids)}"
+            else:
+                topic = url.rsplit("/", 1)[1].replace("%20", " ")
+                command.requests.append(("summary", topic))
+                title = command.redirects.get(topic, topic)
+            return {"title": title, "extract": LOREM}
+        monkeypatch.setattr(command, "_request_json", fake_request_json)
+        return command
+
+    def collect(self, command, topics, limit=12, use_random=False):
+        return command._collect_wikipedia_notes(
+            topic_source=topics, use_random=use_random, limit=limit, language="en",
+        )
+
+    def count(self, command, kind):
+        return sum(1 for request_kind, _ in command.requests if request_kind == kind)
+
+    def test_repeated_topics_are_fetched_once(self, command):
+        """Test that a short or repeated topic list does not refetch topics or extracts."""
+        records = self.collect(command, ["Black holes", "Photosynthesis", "Black holes"])
+
+        assert [title for title, _ in records] == ["Black holes", "Photosynthesis"]
+        assert self.count(command, "summary") == 2
+        assert self.count(command, "extract") == 2
+
+    def test_redirected_duplicate_skips_extract(self, command):
+        """Test that a topic resolving to an already-collected title makes no extract request."""
+        records = self.collect(command, ["Black holes", "Blackhole"])
+
+        assert [title for title, _ in records] == ["Black holes"]
+        assert self.count(command, "summary") == 2
+        assert command.requests.count(("extract", "Black holes")) == 1
+
+    def test_limit_and_order(self, command):
+        """Test that records follow topic order and stop at the limit."""
+        topics = [f"Topic {i}" for i in range(10)]
+        records = self.collect(command, topics, limit=4)
+
+        assert [title for title, _ in records] == topics[:4]
+        assert self.count(command, "extract") == 4
+
+    def test_random_pages(self, command):
+        """Test that random mode collects distinct pages up to the limit."""
+        records = self.collect(command, [], limit=3, use_random=True)
+
+        assert len(records) == 3
+        assert len({title for title, _ in records}) == 3
+        assert self.count(command, "random") == 3
+
+
+def fake_embeddings(texts):
+    """Deterministic stand-in for generate_embeddings_batch (no model download)."""
+    return np.array([[len(text), 1.0, 0.0] for text in texts], dtype=np.float32)
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestPopulateNotesPersist:
+    """Bulk persistence in populate_notes._persist_notes."""
+
+    @pytest.fixture(autouse=True)
+    def no_model(self, monkeypatch):
+        monkeypatch.setattr(populate_notes, "generate_embeddings_batch", fake_embeddings)
+
+    def test_creates_and_updates(self):
+        """Test new titles are created and existing ones updated in place, oldest first."""
+        older = Note.objects.create(title="Black holes", content="old")
+        newer = Note.objects.create(title="Black holes", content="duplicate")
+
+        created, updated = populate_notes.Command()._persist_notes(
+            [("Black holes", "fresh text"), ("Photosynthesis", "light")]
+        )
+
+        assert (created, updated) == (1, 1)
+        older.refresh_from_db()
+        newer.refresh_from_db()
+        assert older.content == "fresh text"
+        assert newer.content == "duplicate"
+        assert older.get_embedding_array() is not None
+        new_note = Note.objects.get(title="Photosynthesis")
+        assert new_note.content == "light"
+        expected = fake_embeddings(["light"])[0]
+        assert np.allclose(new_note.get_embedding_array(), expected / np.linalg.norm(expected))
+
+    def test_update_bumps_updated_at_and_stamp(self):
+        """Test that updates through bulk_update still change the search cache stamp."""
+        note = Note.objects.create(title="Black holes", content="old")
+        before = SemanticSearchService.table_stamp()
+
+        created, updated = populate_notes.Command()._persist_notes([("Black holes", "fresh text")])
+
+        assert (created, updated) == (0, 1)
+        note_updated_at = Note.objects.get(pk=note.pk).updated_at
+        assert note_updated_at > note.updated_at
+        assert SemanticSearchService.table_stamp() != before
+        assert SemanticSearchService.table_stamp()[0] == note_updated_at
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestRegenerateEmbeddings:
+    """The regenerate_embeddings command."""
+
+    def test_missing_only_processes_each_row_once(self, monkeypatch):
+        """Test that --missing-only across several batches embeds every missing note exactly once."""
+        encoded = []
+
+        def recording_embeddings(texts):
+            encoded.extend(texts)
+            return fake_embeddings(texts)
+        monkeypatch.setattr(regenerate_embeddings, "generate_embeddings_batch", recording_embeddings)
+
+        missing, embedded = [], []
+        for i in range(7):
+            note = Note(title=f"Note {i}", content=f"Content {i}")
+            if i % 3 == 0:
+                note.set_embedding_list([1.0, 0.0, 0.0])
+                embedded.append(note)
+            else:
+                missing.append(note)
+            note.save()
+        untouched = {note.pk: note.embedding for note in embedded}
+
+        call_command("regenerate_embeddings", "--missing-only", "--batch-size", "2", stdout=StringIO())
+
+        assert sorted(encoded) == sorted(note.content for note in missing)
+        assert not Note.objects.filter(embedding=b"").exists()
+        for note in Note.objects.filter(pk__in=untouched):
+            assert note.embedding == untouched[note.pk]
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestRenormalizeEmbeddings:
+    """The renormalize_embeddings command."""
+
+    @pytest.fixture
+    def notes(self):
+        """Legacy rows: unnormalized, already unit length, and zero vectors."""
+        vectors = [[3.0, 4.0], [0.6, 0.8], [0.0, 2.0], [0.0, 0.0], [1.0, 1.0]]
+        notes = []
+        for i, vector in enumerate(vectors):
+            note = Note(title=f"Note {i}", content=f"Content {i}")
+            note.embedding = np.asarray(vector, dtype=np.float32).tobytes()  # bypass set_embedding_list
+            note.save()
+            notes.append(note)
+        return notes
+
+    def test_normalizes_in_batches(self, notes, monkeypatch):
+        """Test that off-norm rows are fixed and flushed one batch at a time."""
+        flushed = []
+        original_flush = renormalize_embeddings.Command._flush
+
+        def recording_flush(command, batch):
+            flushed.append(len(batch))
+            original_flush(command, batch)
+        monkeypatch.setattr(renormalize_embeddings.Command, "_flush", recording_flush)
+
+        out = StringIO()
+        call_command("renormalize_embeddings", "--batch-size", "2", stdout=out)
+
+        assert flushed == [1, 1, 1]  # rows 0, 2 and 4, in three separate batches
+        assert "Normalized 3 embeddings" in out.getvalue()
+        assert "Skipping 1 zero-norm" in out.getvalue()
+        by_pk = {note.pk: note for note in Note.objects.all()}
+        for note in notes:
+            stored = by_pk[note.pk]
+            vector = stored.get_embedding_array()
+            if vector.any():
+                assert np.linalg.norm(vector) == pytest.approx(1.0, abs=1e-6)
+        assert by_pk[notes[1].pk].updated_at == notes[1].updated_at  # already unit length
+        assert by_pk[notes[0].pk].updated_at > notes[0].updated_at  # bumped for the cache
+
+    def test_dry_run_writes_nothing(self, notes):
+        """Test that --dry-run only reports."""
+        out = StringIO()
+        call_command("renormalize_embeddings", "--dry-run", stdout=out)
+
+        assert "Would normalize 3 embeddings" in out.getvalue()
+        for note in notes:
+            assert Note.objects.get(pk=note.pk).embedding == note.embedding
+
+
+@pytest.mark.unit
+class TestBackupDatabase:
+    """The backup_database command."""
+
+    @pytest.fixture
+    def database(self, tmp_path, monkeypatch):
+        """A small standalone SQLite database standing in for settings' default DB."""
+        db_path = tmp_path / "db.sqlite3"
+        with closing(sqlite3.connect(db_path)) as conn:
+            conn.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY, content TEXT)")
+            conn.executemany("INSERT INTO notes (content) VALUES (?)", [("note text " * 50,)] * 200)
+            conn.commit()
+        monkeypatch.setattr(settings, "DATABASES", {"default": {"NAME": str(db_path)}})
+        return db_path
+
+    def backup(self, output_dir, *args):
+        out = StringIO()
+        call_command("backup_database", "--output-dir", str(output_dir), *args, stdout=out)
+        return out.getvalue()
+
+    def restored_rows(self, path):
+        with closing(sqlite3.connect(path)) as conn:
+            return conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def test_compressed_backup(self, database, tmp_path, monkeypatch):
+        """Test that the zstd backup is the only file written and restores to the same data."""
+        zstandard = pytest.importorskip("zstandard")
+        connected = []
+        real_connect = sqlite3.connect
+
+        def recording_connect(path, *args, **kwargs):
+            connected.append(str(path))
+            return real_connect(path, *args, **kwargs)
+        monkeypatch.setattr(backup_database.sqlite3, "connect", recording_connect)
+
+        output_dir = tmp_path / "backups"
+        assert "backed up successfully" in self.backup(output_dir)
+        assert connected == [str(database), ":memory:"]  # no uncompressed copy on disk
+
+        backups = list(output_dir.iterdir())
+        assert len(backups) == 1 and backups[0].name.endswith(".sqlite3.zst")
+        assert backups[0].stat().st_size < database.stat().st_size
+
+        restored = tmp_path / "restored.sqlite3"
+        with open(backups[0], "rb") as src, open(restored, "wb") as dst:
+            zstandard.ZstdDecompressor().copy_stream(src, dst)
+        assert self.restored_rows(restored) == 200
+
+    def test_uncompressed_backup(self, database, tmp_path):
+        """Test that --no-compress writes a plain SQLite copy."""
+        output_dir = tmp_path / "backups"
+        self.backup(output_dir, "--no-compress")
+
+        backups = list(output_dir.iterdir())
+        assert len(backups) == 1 and backups[0].name.endswith(".sqlite3")
+        assert self.restored_rows(backups[0]) == 200
+
+    def test_falls_back_without_zstandard(self, database, tmp_path, monkeypatch):
+        """Test that a missing zstandard package produces an uncompressed backup."""
+        monkeypatch.setattr(backup_database, "zstandard", None)
+        output_dir = tmp_path / "backups"
+        assert "zstandard is not installed" in self.backup(output_dir)
+        assert [path.suffix for path in output_dir.iterdir()] == [".sqlite3"]
+
+    def test_prunes_old_backups(self, database, tmp_path):
+        """Test that only the newest --keep backups of either format survive."""
+        output_dir = tmp_path / "backups"
+        output_dir.mkdir()
+        for i, suffix in enumerate([".sqlite3", ".sqlite3.zst", ".sqlite3", ".sqlite3.zst"]):
+            path = output_dir / f"db_backup_2020010{i}_000000{suffix}"
+            path.write_bytes(b"old")
+            os.utime(path, (1_000_000 + i, 1_000_000 + i))
+        unrelated = output_dir / "notes.txt"
+        unrelated.write_text("keep me")
+
+        self.backup(output_dir, "--keep", "2", "--no-compress")
+
+        remaining = sorted(path.name for path in output_dir.iterdir())
+        assert "notes.txt" in remaining
+        assert "db_backup_20200103_000000.sqlite3.zst" in remaining
+        assert len(remaining) == 3  # the new backup, the newest old one, notes.txt
@@ -0,0 +1,148 @@
+"""
+Unit tests for the optional HNSW note index.
+"""
+import json
+import pytest
+import numpy as np
+from django.utils import timezone
+from notes.models import Note
+from notes.index import NoteIndex
+
+pytest.importorskip('hnswlib')
+
+DIM = 8
+
+
+def _vector(seed):
+    return np.random.default_rng(seed).standard_normal(DIM)
+
+
+def _make_note(seed):
+    note = Note(title=f"Note {seed}", content=f"Content {seed}")
+    note.set_embedding_list(_vector(seed))
+    note.save()
+    return note
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestNoteIndex:
+    """Test cases for NoteIndex."""
+
+    @pytest.fixture
+    def notes(self):
+        return [_make_note(seed) for seed in range(20)]
+
+    @pytest.fixture
+    def index(self, tmp_path):
+        return NoteIndex(path=tmp_path / 'notes.hnsw')
+
+    @pytest.fixture
+    def rebuilds(self, index, monkeypatch):
+        """Count full rebuilds of the index."""
+        calls = []
+        original = index._rebuild
+
+        def counting_rebuild(stamp):
+            calls.append(stamp)
+            original(stamp)
+        monkeypatch.setattr(index, '_rebuild', counting_rebuild)
+        return calls
+
+    def test_refresh_builds_and_queries(self, index, notes):
+        """Test that refresh() indexes every embedded note and query() finds the nearest."""
+        Note.objects.create(title="Plain", content="No embedding")
+        assert index.refresh() == len(notes)
+
+        target = notes[7]
+        ids, scores = index.query(target.get_embedding_array(), 3)
+        assert ids[0] == target.pk
+        assert scores[0] == pytest.approx(1.0, abs=1e-5)
+        assert list(scores) == sorted(scores, reverse=True)
+
+    def test_refresh_rebuilds_only_on_stamp_change(self, index, notes, rebuilds):
+        """Test that an unchanged table reuses the index and a bulk write rebuilds it."""
+        index.refresh()
+        index.refresh()
+        assert len(rebuilds) == 1
+
+        note = notes[0]
+        note.set_embedding_list(_vector(100))
+        note.updated_at = timezone.now()
+        Note.objects.bulk_update([note], ['embedding', 'updated_at'])  # bypasses signals
+        index.refresh()
+        assert len(rebuilds) == 2
+        assert index.query(note.get_embedding_array(), 1)[0][0] == note.pk
+
+    def test_upsert_without_rebuild_or_queries(self, index, notes, rebuilds, django_assert_num_queries):
+        """Test that upsert() adds and replaces vectors and keeps the stamp current."""
+        index.refresh()
+        new_note = _make_note(200)
+        with django_assert_num_queries(0):
+            index.upsert(new_note, created=True)
+        assert len(index) == len(notes) + 1
+
+        moved = notes[3]
+        moved.set_embedding_list(_vector(300))
+        moved.save()
+        index.upsert(moved)
+
+        index.refresh()
+        assert len(rebuilds) == 1
+        assert index.query(new_note.get_embedding_array(), 1)[0][0] == new_note.pk
+        assert index.query(moved.get_embedding_array(), 1)[0][0] == moved.pk
+
+    def test_upsert_without_embedding_removes(self, index, notes):
+        """Test that a note whose embedding was cleared leaves the index."""
+        index.refresh()
+        note = notes[5]
+        note.embedding = b''
+        note.save()
+        index.upsert(note)
+        assert len(index) == len(notes) - 1
+        assert note.pk not in index.query(_vector(5), len(notes))[0]
+
+    def test_remove(self, index, notes, rebuilds):
+        """Test that remove() drops a note and the next refresh stays incremental."""
+        index.refresh()
+        oldest = notes[0]
+        note_id = oldest.pk
+        oldest.delete()
+        oldest.pk = note_id  # post_delete handlers still see the pk
+        index.remove(oldest)
+
+        assert len(index) == len(notes) - 1
+        assert note_id not in index.query(_vector(0), len(notes))[0]
+        index.refresh()
+        assert len(rebuilds) == 1
+
+    def test_save_and_load(self, index, notes, tmp_path):
+        """Test that a saved index reloads with its labels and JSON metadata."""
+        index.refresh()
+        index.save()
+
+        with open(tmp_path / 'notes.hnsw.meta') as fh:
+            meta = json.load(fh)
+        assert meta['dim'] == DIM
+        assert sorted(meta['labels']) == sorted(note.pk for note in notes)
+        assert not list(tmp_path.glob('*.tmp'))
+
+        loaded = NoteIndex(path=tmp_path / 'notes.hnsw')
+        loaded.load()
+        assert len(loaded) == len(notes)
+        assert loaded._stamp == index._stamp
+        assert loaded.query(notes[4].get_embedding_array(), 1)[0][0] == notes[4].pk
+
+    def test_load_rejects_mismatched_metadata(self, index, notes, tmp_path):
+        """Test that an index and metadata from different saves are not loaded."""
+        index.refresh()
+        index.save()
+        meta_path = tmp_path / 'notes.hnsw.meta'
+        meta = json.loads(meta_path.read_text())
+        meta['elements'] += 1
+        meta_path.write_text(json.dumps(meta))
+
+        loaded = NoteIndex(path=tmp_path / 'notes.hnsw')
+        loaded.load()
+        assert len(loaded) == 0
+        assert loaded._index is None
@@ -2,12 +2,13 @@
 Integration tests for semantic search functionality.
 """
 import pytest
+import numpy as np
 from django.test import RequestFactory
 from django.contrib.auth.models import User
 from conftest import add_messages_support
 from notes.models import Note
 from notes.admin import NoteAdmin
-from notes.utils import generate_embedding, cosine_similarity
+from notes.utils import generate_embeddings_batch, cosine_similarity
 
 
 @pytest.mark.integration
@@ -26,15 +27,12 @@ class TestSemanticSearch:
             {"title": "Cooking Recipes", "content": "Cooking involves preparing food using various techniques and ingredients."},
         ]
         
-        notes = []
-        for data in notes_data:
-            note = Note.objects.create(**data)
-            embedding = generate_embedding(note.content)
+        notes = [Note(**data) for data in notes_data]
+        embeddings = generate_embeddings_batch([note.content for note in notes])
+        for note, embedding in zip(notes, embeddings):
             note.set_embedding_list(embedding)
-            note.save()
-            notes.append(note)
         
-        return notes
+        return Note.objects.bulk_create(notes)
     
     def test_semantic_search_finds_relevant_notes(self, search_notes, admin_user):
         """Test that semantic search returns relevant notes."""
@@ -94,8 +92,8 @@ class TestSemanticSearch:
         assert len(request.semantic_scores) > 0
         
         # Check that scores are reasonable (between 0 and 1)
-        for score in request.semantic_scores.values():
-            assert 0 <= score <= 1
+        scores = np.fromiter(request.semantic_scores.values(), dtype=float)
+        assert np.all((scores >= 0) & (scores <= 1))
     
     def test_semantic_search_top_k_limit(self, search_notes, admin_user):
         """Test that semantic search limits results to top K."""
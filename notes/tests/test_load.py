@@ -9,7 +9,7 @@ from django.contrib.auth.models import User
 from conftest import add_messages_support
 from notes.models import Note
 from notes.admin import NoteAdmin
-from notes.utils import generate_embedding
+from notes.utils import generate_embeddings_batch
 
 
 @pytest.mark.slow
@@ -21,16 +21,17 @@ class TestLoadPerformance:
     def test_search_performance_with_many_notes(self, db):
         """Test search performance with a large number of notes."""
         # Create 100 notes
-        notes = []
-        for i in range(100):
-            note = Note.objects.create(
+        notes = [
+            Note(
                 title=f"Note {i}",
                 content=f"This is note number {i} about various topics including technology, science, and programming."
             )
-            embedding = generate_embedding(note.content)
+            for i in range(100)
+        ]
+        embeddings = generate_embeddings_batch([note.content for note in notes])
+        for note, embedding in zip(notes, embeddings):
             note.set_embedding_list(embedding)
-            note.save()
-            notes.append(note)
+        Note.objects.bulk_create(notes)
         
         # Perform search
         request = RequestFactory().get('/admin/notes/note/', {'q': 'technology'})
@@ -53,8 +54,9 @@ class TestLoadPerformance:
         texts = [f"This is test text number {i} for performance testing." for i in range(50)]
         
         start_time = time.time()
-        embeddings = [generate_embedding(text) for text in texts]
+        embeddings = generate_embeddings_batch(texts)
         elapsed_time = time.time() - start_time
+        assert len(embeddings) == len(texts)
         
         # Should generate embeddings at reasonable speed
         avg_time_per_embedding = elapsed_time / len(texts)
@@ -63,14 +65,11 @@ class TestLoadPerformance:
     def test_concurrent_searches(self, db):
         """Test that multiple concurrent searches work correctly."""
         # Create test data
-        for i in range(20):
-            note = Note.objects.create(
-                title=f"Note {i}",
-                content=f"Content {i} about machine learning"
-            )
-            embedding = generate_embedding(note.content)
+        notes = [Note(title=f"Note {i}", content=f"Content {i} about machine learning") for i in range(20)]
+        embeddings = generate_embeddings_batch([note.content for note in notes])
+        for note, embedding in zip(notes, embeddings):
             note.set_embedding_list(embedding)
-            note.save()
+        Note.objects.bulk_create(notes)
         
         # Perform multiple searches
         queries = ['machine learning', 'programming', 'data science', 'technology']
@@ -2,7 +2,7 @@
 Unit tests for Note model.
 """
 import pytest
-import json
+import numpy as np
 from django.core.exceptions import ValidationError
 from notes.models import Note
 from notes.utils import generate_embedding
@@ -50,8 +50,56 @@ class TestNoteModel:
         note.set_embedding_list(embedding)
         note.save()
         
-        assert note.embedding == json.dumps(embedding)
-        assert note.get_embedding_list() == embedding
+        expected = np.asarray(embedding, dtype=np.float32)
+        expected /= np.linalg.norm(expected)
+        assert note.embedding == expected.tobytes()
+        assert note.get_embedding_list() == pytest.approx(expected.tolist())
+    
+    def test_get_embedding_array(self):
+        """Test embedding is returned as a float32 array."""
+        note = Note.objects.create(title="Test", content="Content")
+        assert note.get_embedding_array() is None
+
+        note.set_embedding_list([3.0, 4.0])
+        vector = note.get_embedding_array()
+        assert vector.dtype == np.float32
+        assert vector.tolist() == pytest.approx([0.6, 0.8])
+
+    def test_with_embedding_queryset(self):
+        """Test that with_embedding() returns only notes that have an embedding."""
+        embedded = Note(title="Embedded", content="Content")
+        embedded.set_embedding_list([1.0, 0.0])
+        embedded.save()
+        Note.objects.create(title="Plain", content="Content")
+
+        assert list(Note.objects.with_embedding()) == [embedded]
+
+    def test_bulk_update_embeddings_bumps_updated_at(self):
+        """Test that bulk embedding writes still advance updated_at for the search caches."""
+        note = Note.objects.create(title="Test", content="Content")
+        before = note.updated_at
+        note.set_embedding_list([1.0, 0.0])
+        note.content = "Edited"
+        
+        Note.objects.bulk_update_embeddings([note], ['content', 'embedding'])
+        
+        note.refresh_from_db()
+        assert note.updated_at > before
+        assert note.content == "Edited"
+        assert note.get_embedding_list() == [1.0, 0.0]
+    
+    def test_set_embedding_list_normalizes(self):
+        """Test that stored embeddings are L2-normalized."""
+        note = Note(title="Test", content="Content")
+        note.set_embedding_list([3.0, 4.0])
+        
+        assert note.get_embedding_list() == pytest.approx([0.6, 0.8])
+    
+    def test_set_embedding_list_rejects_zero_vector(self):
+        """Test that zero-norm embeddings are rejected at write time."""
+        note = Note(title="Test", content="Content")
+        with pytest.raises(ValueError):
+            note.set_embedding_list([0.0, 0.0, 0.0])
     
     def test_embedding_round_trip(self):
         """Test that embedding survives save/load cycle."""
@@ -66,7 +114,9 @@ class TestNoteModel:
         loaded_embedding = note.get_embedding_list()
         
         assert len(loaded_embedding) == len(original_embedding)
-        assert all(abs(a - b) < 1e-6 for a, b in zip(loaded_embedding, original_embedding))
+        # generate_embedding already returns float32 unit vectors (also under FP16/BF16),
+        # so renormalizing on save only moves values by float32 rounding
+        assert np.allclose(loaded_embedding, original_embedding, atol=1e-6)
     
     def test_note_ordering(self):
         """Test that notes are ordered by created_at descending."""
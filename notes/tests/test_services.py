@@ -0,0 +1,140 @@
+"""
+Unit tests for the semantic search service.
+"""
+import pytest
+import numpy as np
+from notes import services
+from notes.services import SemanticSearchService
+
+
+def _unit_rows(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.standard_normal((n, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def _exact_top_k(matrix, query_vec, top_k):
+    scores = matrix @ query_vec
+    idx = np.argsort(-scores)[:top_k]
+    return idx, scores[idx]
+
+
+@pytest.mark.unit
+class TestTopMatches:
+    """Every top_matches backend returns the exact top-k of M @ q."""
+
+    TOP_K = 10
+
+    @pytest.fixture
+    def matrix(self):
+        return _unit_rows(1000, 64)
+
+    @pytest.fixture
+    def queries(self):
+        return _unit_rows(5, 64, seed=1)
+
+    @pytest.fixture(autouse=True)
+    def float_search(self, monkeypatch):
+        """Start every test on the plain float path; tests opt into other backends."""
+        monkeypatch.setattr(SemanticSearchService, 'FAISS_SEARCH', False)
+        monkeypatch.setattr(SemanticSearchService, 'INT8_SEARCH', False)
+
+    def _assert_exact(self, matrix, queries):
+        for query_vec in queries:
+            idx, scores = SemanticSearchService.top_matches(query_vec, matrix, self.TOP_K)
+            expected_idx, expected_scores = _exact_top_k(matrix, query_vec, self.TOP_K)
+            assert idx.tolist() == expected_idx.tolist()
+            assert np.allclose(scores, expected_scores, atol=1e-5)
+
+    def test_float(self, matrix, queries):
+        """Test the float32 matrix-vector path."""
+        self._assert_exact(matrix, queries)
+
+    def test_int8_numba(self, monkeypatch, matrix, queries):
+        """Test the int8 shortlist scanned by the Numba kernel, then rescored."""
+        if not services.NUMBA_AVAILABLE:
+            pytest.skip("numba is not installed")
+        monkeypatch.setattr(SemanticSearchService, 'INT8_SEARCH', True)
+        self._assert_exact(matrix, queries)
+
+    def test_int8_einsum(self, monkeypatch, matrix, queries):
+        """Test the int8 shortlist scanned with NumPy einsum (no Numba), then rescored."""
+        monkeypatch.setattr(SemanticSearchService, 'INT8_SEARCH', True)
+        monkeypatch.setattr(services, 'NUMBA_AVAILABLE', False)
+        self._assert_exact(matrix, queries)
+
+    def test_int8_kernels_agree(self, matrix, queries):
+        """Test the Numba int8 kernel matches the einsum fallback bit for bit."""
+        if not services.NUMBA_AVAILABLE:
+            pytest.skip("numba is not installed")
+        codes, _ = services.quantize_int8_scaled(matrix)
+        query_i8, _ = services.quantize_int8_scaled(queries[0])
+        dots = np.empty(codes.shape[0], dtype=np.int32)
+        services.int8_dot_scores(codes, query_i8, dots)
+        expected = np.einsum('ij,j->i', codes, query_i8.astype(np.int32), dtype=np.int32, casting='unsafe')
+        assert dots.tolist() == expected.tolist()
+
+    def test_faiss_flat(self, monkeypatch, matrix, queries):
+        """Test the exact FAISS IndexFlatIP path."""
+        monkeypatch.setattr(services, 'faiss', pytest.importorskip('faiss'))
+        monkeypatch.setattr(SemanticSearchService, 'FAISS_SEARCH', True)
+        self._assert_exact(matrix, queries)
+
+    def test_faiss_ivf(self, monkeypatch, matrix, queries):
+        """Test the IVF path; probing every list makes it exact."""
+        monkeypatch.setattr(services, 'faiss', pytest.importorskip('faiss'))
+        monkeypatch.setattr(SemanticSearchService, 'FAISS_SEARCH', True)
+        monkeypatch.setattr(SemanticSearchService, 'FAISS_IVF_THRESHOLD', 500)
+        monkeypatch.setattr(SemanticSearchService, 'FAISS_NPROBE', 64)
+        self._assert_exact(matrix, queries)
+
+    def test_empty_matrix(self, queries):
+        """Test that an empty matrix yields no matches."""
+        idx, scores = SemanticSearchService.top_matches(queries[0], np.empty((0, 0), dtype=np.float32), 5)
+        assert idx.size == 0
+        assert scores.size == 0
+
+    def test_top_k_larger_than_matrix(self, monkeypatch, queries):
+        """Test that asking for more rows than exist returns them all, best first."""
+        matrix = _unit_rows(3, 64, seed=2)
+        for int8 in (False, True):
+            monkeypatch.setattr(SemanticSearchService, 'INT8_SEARCH', int8)
+            idx, _ = SemanticSearchService.top_matches(queries[0], matrix, 10)
+            assert idx.tolist() == _exact_top_k(matrix, queries[0], 3)[0].tolist()
+
+
+@pytest.mark.unit
+class TestSimpleAnswer:
+    """Keyword fallback used when Gemma is unavailable."""
+
+    def answer(self, question, notes):
+        return services.AIService._generate_simple_answer(question, notes)
+
+    def test_picks_matching_sentences(self):
+        """Test that only sentences sharing a keyword with the question are kept."""
+        note = "Photosynthesis converts light into energy. Plants need water. Chlorophyll absorbs light!"
+        assert self.answer("Why does light matter?", [note]) == (
+            "Photosynthesis converts light into energy. Chlorophyll absorbs light!"
+        )
+
+    def test_keeps_abbreviations_inside_sentences(self):
+        """Test that 'Dr.' and 'e.g.' do not end a sentence."""
+        note = "Dr. Smith studied black holes, e.g. Sagittarius A*. The weather was nice."
+        assert self.answer("Who studied black holes?", [note]) == (
+            "Dr. Smith studied black holes, e.g. Sagittarius A*."
+        )
+
+    def test_no_terminal_punctuation(self):
+        """Test that content without a final period still yields one sentence."""
+        assert self.answer("black holes", ["Black holes bend light"]) == "Black holes bend light."
+
+    def test_caps_at_five_sentences(self):
+        """Test that at most five matching sentences are returned, across notes."""
+        notes = ["Stars shine. " * 4, "Stars burn. " * 4]
+        answer = self.answer("stars", notes)
+        assert answer.count("Stars") == 5
+
+    def test_falls_back_to_summaries(self):
+        """Test that notes are summarized when no sentence matches."""
+        assert self.answer("zebra", ["Plants need water."]) == "Plants need water."
+        assert self.answer("anything", []) == "I don't have enough information to answer that question."
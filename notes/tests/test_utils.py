@@ -3,7 +3,11 @@ Unit tests for utility functions.
 """
 import pytest
 import numpy as np
-from notes.utils import generate_embedding, cosine_similarity, get_model
+from notes import utils
+from notes.utils import (
+    generate_embedding, cosine_similarity, cosine_similarity_batch,
+    get_model, quantize_int8_scaled, top_k_indices,
+)
 
 
 @pytest.mark.unit
@@ -26,8 +30,9 @@ class TestEmbeddingUtils:
         embedding2 = generate_embedding(text)
         
         assert len(embedding1) == len(embedding2)
-        # Embeddings should be identical (deterministic)
-        assert all(abs(a - b) < 1e-6 for a, b in zip(embedding1, embedding2))
+        # Embeddings should be identical (deterministic); both are float32-normalized
+        # whatever precision the model runs in, so float32 rounding is the only slack
+        assert np.allclose(embedding1, embedding2, atol=1e-6)
     
     def test_embedding_different_texts(self):
         """Test that different texts produce different embeddings."""
@@ -60,6 +65,18 @@ class TestEmbeddingUtils:
         similarity = cosine_similarity(vec1, vec2)
         assert similarity == 0.0
     
+    def test_cosine_similarity_batch(self):
+        """Test batched cosine similarity against the scalar version."""
+        query = [1.0, 2.0, 3.0]
+        matrix = np.array([[1.0, 2.0, 3.0], [-1.0, 0.5, 2.0], [0.0, 0.0, 0.0]])
+        scores = cosine_similarity_batch(query, matrix)
+        
+        assert scores.shape == (3,)
+        assert scores[0] == pytest.approx(1.0)
+        assert scores[1] == pytest.approx(cosine_similarity(query, matrix[1]))
+        assert scores[2] == 0.0
+        assert np.all(cosine_similarity_batch([0.0, 0.0, 0.0], matrix) == 0.0)
+    
     def test_cosine_similarity_similar_texts(self):
         """Test that similar texts have higher cosine similarity."""
         text1 = "Machine learning algorithms"
@@ -76,6 +93,83 @@ class TestEmbeddingUtils:
         # Similar texts should have higher similarity
         assert sim_12 > sim_13
     
+    def test_generate_embedding_is_memoized(self, monkeypatch):
+        """Test that identical text is only encoded once."""
+        calls = []
+        
+        class FakeModel:
+            def encode(self, text, **kwargs):
+                calls.append(text)
+                return np.array([3.0, 4.0], dtype=np.float32)
+        
+        monkeypatch.setattr(utils, 'get_model', lambda: FakeModel())
+        utils._EMBEDDING_LRU.clear()
+        try:
+            first = generate_embedding("cache me please")
+            first.append(0.0)  # callers get their own copy
+            second = generate_embedding("cache me please")
+        finally:
+            utils._EMBEDDING_LRU.clear()
+        
+        assert second == pytest.approx([0.6, 0.8])
+        assert calls == ["cache me please"]
+    
+    def test_half_precision_output_is_unit_norm(self, monkeypatch):
+        """Test that FP16/BF16 model output is normalized in float32."""
+        class HalfModel:
+            # Normalized in half precision, so the norm is slightly off 1
+            def encode(self, texts, **kwargs):
+                row = np.full(384, 1.0006 / np.sqrt(384), dtype=np.float16)
+                return np.tile(row, (len(texts), 1)) if isinstance(texts, list) else row
+        
+        monkeypatch.setattr(utils, 'get_model', lambda: HalfModel())
+        utils._EMBEDDING_LRU.clear()
+        try:
+            single = np.asarray(generate_embedding("half precision text"))
+        finally:
+            utils._EMBEDDING_LRU.clear()
+        batch = utils.generate_embeddings_batch(["one", "two"])
+        
+        assert batch.dtype == np.float32
+        assert np.linalg.norm(single) == pytest.approx(1.0, abs=1e-6)
+        assert np.allclose(np.linalg.norm(batch, axis=1), 1.0, atol=1e-6)
+    
+    def test_embedding_cache_key(self, monkeypatch):
+        """Test that the cache is keyed by digest and precision, not the raw text."""
+        import torch
+        text = "a long note body " * 100
+        key = utils._cache_key(text)
+        assert text not in key
+        
+        utils.embedding_dtype.cache_clear()
+        monkeypatch.setattr(utils, 'EMBEDDING_HALF_PRECISION', False)
+        try:
+            assert utils.embedding_dtype() == torch.float32
+            fp32_key = utils._cache_key(text)
+            utils.embedding_dtype.cache_clear()
+            monkeypatch.setattr(utils, 'EMBEDDING_HALF_PRECISION', True)
+            monkeypatch.setattr(utils, 'get_device_name', lambda: 'cuda')
+            assert utils.embedding_dtype() == torch.float16
+            assert utils._cache_key(text) != fp32_key
+        finally:
+            utils.embedding_dtype.cache_clear()
+    
+    def test_top_k_indices(self):
+        """Test that top_k_indices returns the highest scores in order."""
+        scores = np.array([0.1, 0.9, 0.4, 0.7, 0.2])
+        assert top_k_indices(scores, 3).tolist() == [1, 3, 2]
+        assert top_k_indices(scores, 10).tolist() == [1, 3, 2, 4, 0]
+        assert top_k_indices(np.array([]), 3).size == 0
+    
+    def test_quantize_int8_scaled(self):
+        """Test per-row int8 quantization uses the full range of each row."""
+        vectors = np.array([[0.2, -0.1, 0.05], [0.0, 0.0, 0.0]], dtype=np.float32)
+        codes, scales = quantize_int8_scaled(vectors)
+        assert codes.dtype == np.int8
+        assert codes[0].tolist() == [127, -64, 32]
+        assert codes[1].tolist() == [0, 0, 0]
+        assert np.allclose(codes * scales[:, None], vectors, atol=scales[0])
+    
     def test_get_model_singleton(self):
         """Test that get_model returns the same instance."""
         model1 = get_model()
@@ -1,33 +1,214 @@
 from sentence_transformers import SentenceTransformer
+from sentence_transformers.util import get_device_name
+from django.conf import settings
+from collections import OrderedDict
+import functools
+import hashlib
+import threading
 import numpy as np
+import torch
 
-# Load model once (singleton pattern)
-_model = None
+from ._simkernel import cosine_scalar
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Texts whose embeddings are memoized in-process (see generate_embedding)
+EMBEDDING_CACHE_SIZE = 1024
 
+# In-process LRU keyed by _cache_key(text), so long note bodies are not kept as keys
+_EMBEDDING_LRU = OrderedDict()
+_EMBEDDING_LRU_LOCK = threading.Lock()
 
+
+# Run the model in FP16 on CUDA / BF16 on CPUs with native BF16 (AVX512-BF16 or AMX)
+EMBEDDING_HALF_PRECISION = getattr(settings, 'NOTES_EMBEDDING_HALF', True)
+
+
+# Load model once (singleton pattern)
+@functools.lru_cache(maxsize=None)
 def get_model():
     """Get or initialize the SentenceTransformer model."""
-    global _model
-    if _model is None:
-        _model = SentenceTransformer('all-MiniLM-L6-v2')
-    return _model
+    device = get_device_name()
+    model = SentenceTransformer(MODEL_NAME, device=device)
+    dtype = embedding_dtype()
+    if dtype != torch.float32:
+        model = model.to(dtype)
+    return model
+
+
+@functools.lru_cache(maxsize=None)
+def embedding_dtype():
+    """
+    Floating-point dtype get_model() runs the model in.
+    
+    Known without loading the model, so cache keys can include it.
+    """
+    if not EMBEDDING_HALF_PRECISION:
+        return torch.float32
+    device = get_device_name()
+    if device.startswith('cuda'):
+        return torch.float16
+    if device == 'cpu':
+        # Private probes; older torch builds lack them, which means no BF16 path
+        has_bf16 = getattr(torch.cpu, '_is_avx512_bf16_supported', lambda: False)
+        has_amx = getattr(torch.cpu, '_is_amx_tile_supported', lambda: False)
+        if has_bf16() or has_amx():
+            return torch.bfloat16
+    return torch.float32
+
+
+def warm_up_model():
+    """Load the model and run one encode so the first real request skips both costs."""
+    get_model().encode("warmup", convert_to_numpy=True, show_progress_bar=False)
+
+
+def is_model_loaded():
+    """Whether get_model() has already loaded the model in this process."""
+    return get_model.cache_info().currsize > 0
 
 
 def generate_embedding(text):
-    """Generate embedding for a given text."""
+    """
+    Generate an L2-normalized embedding for a given text.
+    
+    Repeated texts (re-issued admin searches, re-imported notes) are served
+    from an in-process LRU and, when configured, a disk cache, skipping the
+    model forward pass.
+    """
+    return list(_encode_cached(text))
+
+
+def _content_hash(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _cache_key(text):
+    # Vectors differ slightly between FP32 and FP16/BF16 runs, so precision is part of the key
+    return (MODEL_NAME, str(embedding_dtype()), _content_hash(text))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_disk_cache():
+    """Persistent embedding cache, if NOTES_EMBEDDING_CACHE_DIR is set and diskcache is installed."""
+    cache_dir = getattr(settings, 'NOTES_EMBEDDING_CACHE_DIR', None)
+    if not cache_dir or diskcache is None:
+        return None
+    return diskcache.Cache(cache_dir)
+
+
+def _encode_cached(text):
+    # Tuples keep cached vectors immutable; generate_embedding hands out copies.
+    # The disk cache shares the (model, precision, content hash) key so it survives restarts.
+    key = _cache_key(text)
+    with _EMBEDDING_LRU_LOCK:
+        embedding = _EMBEDDING_LRU.get(key)
+        if embedding is not None:
+            _EMBEDDING_LRU.move_to_end(key)
+            return embedding
+    
+    disk_cache = _get_disk_cache()
+    if disk_cache is not None:
+        embedding = disk_cache.get(key)
+    if embedding is None:
+        embedding = tuple(_unit_float32(get_model().encode(text, convert_to_numpy=True)).tolist())
+        if disk_cache is not None:
+            disk_cache.set(key, embedding)
+    
+    with _EMBEDDING_LRU_LOCK:
+        _EMBEDDING_LRU[key] = embedding
+        if len(_EMBEDDING_LRU) > EMBEDDING_CACHE_SIZE:
+            _EMBEDDING_LRU.popitem(last=False)
+    return embedding
+
+
+def _unit_float32(embeddings):
+    """
+    Cast model output to float32 and L2-normalize it along the last axis.
+    
+    Normalizing inside encode() happens in the model's dtype, which leaves
+    FP16/BF16 vectors with norms around 1.0005; search scores them with a
+    plain dot product, so the norm is fixed here in float32 instead.
+    Zero rows stay zero.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.where(norms > 0, norms, 1.0)
+
+
+def generate_embeddings_batch(texts, batch_size=64):
+    """
+    Generate L2-normalized embeddings for a list of texts in batched forward passes.
+    
+    Identical texts are encoded once and the vector is shared; rows of the
+    result still line up with ``texts``.
+    """
+    slots = {}
+    positions = [slots.setdefault(text, len(slots)) for text in texts]
     model = get_model()
-    embedding = model.encode(text)
-    return embedding.tolist()
+    embeddings = _unit_float32(model.encode(
+        list(slots),
+        batch_size=batch_size,
+        convert_to_numpy=True,
+    ))
+    if len(slots) == len(positions):
+        return embeddings
+    return embeddings[positions]
+
+
+def cosine_similarity_batch(query_vec, matrix):
+    """
+    Cosine similarity of one query vector against every row of a matrix.
+    
+    One matrix-vector product instead of a Python call per row. Zero
+    vectors (query or row) score 0.0.
+    """
+    query_vec = np.asarray(query_vec)
+    matrix = np.atleast_2d(np.asarray(matrix))
+    query_norm = np.linalg.norm(query_vec)
+    row_norms = np.linalg.norm(matrix, axis=1)
+    if query_norm == 0:
+        return np.zeros(matrix.shape[0], dtype=np.result_type(matrix, np.float32))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = (matrix @ query_vec) / (row_norms * query_norm)
+    return np.where(row_norms > 0, scores, 0.0)
 
 
 def cosine_similarity(vec1, vec2):
     """Calculate cosine similarity between two vectors."""
-    vec1 = np.array(vec1)
-    vec2 = np.array(vec2)
-    dot_product = np.dot(vec1, vec2)
-    norm1 = np.linalg.norm(vec1)
-    norm2 = np.linalg.norm(vec2)
-    if norm1 == 0 or norm2 == 0:
-        return 0.0
-    return dot_product / (norm1 * norm2)
+    if cosine_scalar is not None:
+        vec1 = np.ascontiguousarray(vec1, dtype=np.float64)
+        vec2 = np.ascontiguousarray(vec2, dtype=np.float64)
+        if vec1.shape != vec2.shape or vec1.ndim != 1:
+            raise ValueError(f"shapes {vec1.shape} and {vec2.shape} not aligned")
+        return cosine_scalar(vec1, vec2)
+    return float(cosine_similarity_batch(vec1, [vec2])[0])
+
+
+def quantize_int8_scaled(vectors):
+    """
+    Quantize vectors to int8 with one scale per row (its max |value| maps to 127).
+    
+    Every row uses the full int8 range, so dot products of the codes track
+    the float scores closely. Returns (codes, scales); codes * scales
+    approximates the input.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=-1, keepdims=True) / 127
+    scales[scales == 0] = 1.0
+    codes = np.round(vectors / scales).astype(np.int8)
+    return codes, scales[..., 0]
+
 
+def top_k_indices(scores, k):
+    """Return indices of the k highest scores, highest first."""
+    k = min(k, scores.size)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    # O(N) partial selection, then sort only the k survivors
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
@@ -130,6 +130,37 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Semantic search: scan an int8-quantized copy of the embedding matrix and
+# rescore the shortlist in float32. Only pays off with the compiled Numba
+# kernel (NumPy has no int8 BLAS), so it defaults to on when numba is
+# installed. Set explicitly to override.
+# NOTES_INT8_SEARCH = True
+
+# Alternatively search through a FAISS inner-product index (requires faiss).
+# Exact below 50k notes, IVF (approximate, ~99% recall) above; the index is
+# rebuilt whenever notes change, so leave off for frequently edited data.
+# NOTES_FAISS_SEARCH = False
+
+# Or an incrementally updated HNSW graph (requires hnswlib); saved to
+# NOTES_HNSW_PATH at exit and reloaded on startup when that is set.
+# NOTES_HNSW_SEARCH = False
+# NOTES_HNSW_PATH = BASE_DIR / 'cache' / 'notes.hnsw'
+
+# Persist computed embeddings across restarts, keyed by (model, content hash).
+# Requires the optional diskcache package; unset keeps the cache in-process only.
+# NOTES_EMBEDDING_CACHE_DIR = BASE_DIR / 'cache' / 'embeddings'
+
+# Run the embedding model in FP16 on CUDA and BF16 on CPUs with native BF16
+# support (default on); vectors are stored as float32 either way.
+# NOTES_EMBEDDING_HALF = True
+
+# Gemma answer generation: load 4-bit NF4 weights when running on CUDA with
+# bitsandbytes installed (default on), and optionally torch.compile the model.
+# NOTES_GEMMA_4BIT = True
+# NOTES_GEMMA_COMPILE = False
+# Reuse the KV cache of the fixed instruction prefix of the prompt (default on).
+# NOTES_GEMMA_PREFIX_CACHE = True
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -7,7 +7,7 @@ from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.http import require_http_methods
 from django.db import connection
 from notes.models import Note
-from notes.utils import get_model
+from notes.utils import get_model, is_model_loaded
 import json
 
 
@@ -34,8 +34,9 @@ def health_check(request):
     
     # Embedding model check
     try:
-        model = get_model()
-        test_embedding = model.encode("test")
+        # Only run a test encode on a cold load, not on every probe
+        if not is_model_loaded():
+            get_model().encode("test", convert_to_numpy=True, show_progress_bar=False)
         health_status['checks']['embedding_model'] = 'ok'
     except Exception as e:
         health_status['checks']['embedding_model'] = f'error: {str(e)}'
@@ -44,11 +45,7 @@ def health_check(request):
     # Basic statistics
     try:
         total_notes = Note.objects.count()
-        notes_with_embeddings = Note.objects.exclude(
-            embedding=''
-        ).exclude(
-            embedding__isnull=True
-        ).count()
+        notes_with_embeddings = Note.objects.with_embedding().count()
         
         health_status['checks']['notes'] = {
             'total': total_notes,
@@ -75,11 +72,7 @@ def metrics(request):
     metrics_data = {
         'notes': {
             'total': Note.objects.count(),
-            'with_embeddings': Note.objects.exclude(
-                embedding=''
-            ).exclude(
-                embedding__isnull=True
-            ).count(),
+            'with_embeddings': Note.objects.with_embedding().count(),
         }
     }
     
@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/wsgi/
 """
 
+import logging
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -15,3 +16,13 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 
 application = get_wsgi_application()
 
+# Load and warm the embedding model at startup rather than on the first
+# search or health probe. Set SKIP_MODEL_LOAD=1 to defer it.
+if not os.environ.get('SKIP_MODEL_LOAD'):
+    from notes.utils import warm_up_model
+
+    try:
+        warm_up_model()
+    except Exception:
+        logging.getLogger('notes').exception('Embedding model warm-up failed; loading on first use')
+